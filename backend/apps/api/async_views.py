@@ -0,0 +1,193 @@
+"""
+Асинхронные реализации читающих эндпоинтов для запуска под ASGI.
+
+GET и HEAD обслуживаются корутинами на асинхронном ORM Django,
+остальные методы передаются синхронным представлениям DRF. Ответы
+совпадают с ответами DRF в формате JSON; обзорный HTML-интерфейс DRF
+здесь недоступен.
+"""
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+
+from apps.api.autocomplete import ingredient_index
+from apps.api.conditional import (
+    aconditional,
+    async_recipe_conditional,
+    versioned,
+)
+from apps.api.filters import IngredientFilter, RecipeFilter
+from apps.api.pagination import FoodgramPagination
+from apps.api.serializers import (
+    IngredientSerializer,
+    RecipeSerializer,
+    TagSerializer,
+)
+from apps.api.views import RecipeViewSet
+from apps.recipes.models import Ingredient, Recipe, Tag
+
+READ_METHODS = ('GET', 'HEAD')
+
+# Для пагинации: курсор как у RecipeViewSet
+RECIPE_VIEW = SimpleNamespace(
+    cursor_ordering=RecipeViewSet.cursor_ordering,
+    ranked_query_params=RecipeViewSet.ranked_query_params,
+)
+
+
+def read_view(async_view, sync_view):
+    """
+    Представление: GET и HEAD — async_view, остальные методы — sync_view.
+
+    Перед async_view выполняются аутентификация, проверки прав и
+    ограничения частоты запросов из класса sync_view, как в DRF;
+    async_view получает запрос DRF.
+    """
+
+    async def view(request, *args, **kwargs):
+        if request.method not in READ_METHODS:
+            return await sync_to_async(sync_view)(request, *args, **kwargs)
+        drf_view = _viewset(sync_view, request, args, kwargs)
+        try:
+            await sync_to_async(drf_view.initial)(
+                drf_view.request, *args, **kwargs
+            )
+            return await async_view(drf_view.request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return await sync_to_async(_error_response)(drf_view, exc)
+
+    # csrf_exempt в Django 4.2 не поддерживает корутины; CSRF для
+    # сессий проверяет сам DRF, как в sync_view
+    view.csrf_exempt = True
+    view.cls = getattr(sync_view, 'cls', None)
+    view.actions = getattr(sync_view, 'actions', None)
+    return view
+
+
+def _viewset(sync_view, request, args, kwargs):
+    """
+    Экземпляр вьюсета sync_view, подготовленный как в его dispatch:
+    с действием, запросом DRF и заголовками ответа.
+    """
+    actions = dict(sync_view.actions)
+    if 'get' in actions:
+        actions.setdefault('head', actions['get'])
+    view = sync_view.cls(**sync_view.initkwargs)
+    view.action_map = actions
+    view.args, view.kwargs = args, kwargs
+    view.request = view.initialize_request(request, *args, **kwargs)
+    view.headers = view.default_response_headers
+    return view
+
+
+def _error_response(view, exc):
+    """Ответ на исключение API, как его строит DRF (с заголовками)."""
+    response = view.finalize_response(
+        view.request, view.handle_exception(exc)
+    )
+    return response.render()
+
+
+def _json(data, status=200):
+    return HttpResponse(
+        JSONRenderer().render(data),
+        status=status,
+        content_type='application/json',
+    )
+
+
+async def _get_or_404(queryset, pk):
+    try:
+        return await queryset.aget(pk=pk)
+    except queryset.model.DoesNotExist:
+        raise exceptions.NotFound
+
+
+@versioned('tags', decorator=aconditional)
+async def tag_list(request):
+    tags = [tag async for tag in Tag.objects.all()]
+    return _json(TagSerializer(tags, many=True).data)
+
+
+@versioned('tags', decorator=aconditional)
+async def tag_detail(request, pk):
+    tag = await _get_or_404(Tag.objects.all(), pk)
+    return _json(TagSerializer(tag).data)
+
+
+@versioned('ingredients', decorator=aconditional,
+           stamp=ingredient_index.version)
+async def ingredient_list(request):
+    """Индекс в памяти или нечёткий поиск фильтром, как в DRF."""
+    if not IngredientFilter.is_fuzzy(request.GET):
+        return _json(await sync_to_async(ingredient_index.search)(
+            request.GET.get('name', '')
+        ))
+    # Без PostgreSQL нечёткий поиск ранжирует строки в Python уже
+    # при построении queryset, поэтому фильтр целиком вне цикла событий
+    ingredients = await sync_to_async(_filtered)(IngredientFilter(
+        request.GET, queryset=Ingredient.objects.all()
+    ))
+    return _json(IngredientSerializer(ingredients, many=True).data)
+
+
+@versioned('ingredients', decorator=aconditional)
+async def ingredient_detail(request, pk):
+    ingredient = await _get_or_404(Ingredient.objects.all(), pk)
+    return _json(IngredientSerializer(ingredient).data)
+
+
+def _valid_qs(filterset):
+    if not filterset.is_valid():
+        raise exceptions.ValidationError(filterset.errors)
+    return filterset.qs
+
+
+def _filtered(filterset):
+    return list(_valid_qs(filterset))
+
+
+def _filter_and_paginate(request):
+    filterset = RecipeFilter(
+        request.query_params,
+        queryset=Recipe.objects.alive().for_display(request.user),
+        request=request,
+    )
+    paginator = FoodgramPagination()
+    page = paginator.paginate_queryset(
+        _valid_qs(filterset), request, RECIPE_VIEW
+    )
+    return paginator, page
+
+
+async def recipe_list(request):
+    """
+    Список рецептов с фильтрами и пагинацией RecipeViewSet.
+
+    Проверка фильтров (теги по slug), нечёткий поиск без PostgreSQL
+    и выборка страницы с COUNT выполняются одним вызовом sync_to_async.
+    """
+    paginator, page = await sync_to_async(_filter_and_paginate)(request)
+    data = RecipeSerializer(
+        page, many=True, context={'request': request}
+    ).data
+    return _json(paginator.get_paginated_response(data).data)
+
+
+@async_recipe_conditional
+async def recipe_detail(request, pk):
+    recipe = await _get_or_404(
+        Recipe.objects.alive().for_display(request.user), pk
+    )
+    return _json(RecipeSerializer(recipe, context={'request': request}).data)
+
+
+async def recipe_get_link(request, pk):
+    if not await Recipe.objects.alive().filter(pk=pk).aexists():
+        raise exceptions.NotFound
+    return _json({
+        'short-link': request.build_absolute_uri(f'/recipes/{pk}/')
+    })
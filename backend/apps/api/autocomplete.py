@@ -0,0 +1,71 @@
+import threading
+import time
+from bisect import bisect_left
+
+from apps.recipes.models import Ingredient
+from apps.recipes.versions import get_version
+from config.constants import INGREDIENT_INDEX_CHECK_INTERVAL
+
+
+class IngredientIndex:
+    """
+    Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Справочник строится при первом обращении и перестраивается,
+    только когда меняется метка версии 'ingredients'. Метка читается
+    из БД не чаще раза в INGREDIENT_INDEX_CHECK_INTERVAL секунд,
+    остальные поиски к БД не обращаются. Сначала возвращаются
+    совпадения по началу названия, затем по подстроке.
+    """
+
+    version_name = 'ingredients'
+    fields = ('id', 'name', 'measurement_unit')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = None
+        # (метка, ключи, строки) публикуются одним присваиванием
+        self._data = (None, [], [])
+
+    def version(self):
+        """Метка версии, по которой построен текущий индекс."""
+        return self._snapshot()[0]
+
+    def search(self, query=''):
+        _, keys, rows = self._snapshot()
+        query = query.strip().casefold()
+        if not query:
+            return rows
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + '\U0010ffff', start)
+        substring = [
+            row for index, (key, row) in enumerate(zip(keys, rows))
+            if query in key and not start <= index < end
+        ]
+        return rows[start:end] + substring
+
+    def _snapshot(self):
+        checked_at = self._checked_at
+        if (checked_at is None or time.monotonic() - checked_at
+                >= INGREDIENT_INDEX_CHECK_INTERVAL):
+            with self._lock:
+                if self._checked_at is checked_at:
+                    self._refresh()
+        return self._data
+
+    def _refresh(self):
+        version = get_version(self.version_name)
+        if version != self._data[0]:
+            entries = sorted(
+                (row['name'].casefold(), row['id'], row)
+                for row in Ingredient.objects.values(*self.fields)
+            )
+            self._data = (
+                version,
+                [key for key, _, _ in entries],
+                [row for _, _, row in entries],
+            )
+        self._checked_at = time.monotonic()
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,178 @@
+import hashlib
+from calendar import timegm
+from datetime import datetime, timezone
+from functools import partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    quote_etag,
+)
+from django.utils.http import http_date
+from django.views.decorators.http import condition
+
+from apps.recipes.models import Recipe
+from apps.recipes.versions import USER_VERSION, get_version, get_versions
+
+
+def make_etag(*parts):
+    """Строит ETag из составных частей версии ответа."""
+    return hashlib.md5(
+        ':'.join(map(str, parts)).encode(), usedforsecurity=False
+    ).hexdigest()
+
+
+def conditional(etag_func, last_modified_func, private=False):
+    """
+    Условный GET: отвечает 304 по If-None-Match / If-Modified-Since
+    до вызова представления и требует от клиента ревалидации.
+    """
+
+    def decorator(view):
+        view = condition(etag_func=etag_func,
+                         last_modified_func=last_modified_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            _require_revalidation(response, private)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _require_revalidation(response, private):
+    if private:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+
+
+def _validators(etag_func, last_modified_func, request, *args, **kwargs):
+    etag = etag_func(request, *args, **kwargs)
+    last_modified = last_modified_func(request, *args, **kwargs)
+    return (
+        etag and quote_etag(etag),
+        last_modified and timegm(last_modified.utctimetuple()),
+    )
+
+
+def aconditional(etag_func, last_modified_func, private=False):
+    """
+    conditional для асинхронных представлений.
+
+    Функции версий синхронные (запросы к БД) и выполняются через
+    sync_to_async.
+    """
+
+    def decorator(view):
+
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            etag, last_modified = await sync_to_async(_validators)(
+                etag_func, last_modified_func, request, *args, **kwargs
+            )
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = await view(request, *args, **kwargs)
+                if etag and not response.has_header('ETag'):
+                    response.headers['ETag'] = etag
+                if last_modified and not response.has_header(
+                    'Last-Modified'
+                ):
+                    response.headers['Last-Modified'] = http_date(
+                        last_modified
+                    )
+            _require_revalidation(response, private)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def versioned(name, decorator=conditional, stamp=None):
+    """
+    Условный GET для справочника с меткой версии name.
+
+    Пока метка не сдвинулась, 304 отдаётся после одного запроса к
+    таблице версий. stamp заменяет чтение метки из БД: представление,
+    отдающее данные из кеша процесса, передаёт метку этого кеша, чтобы
+    ETag не опережал данные. Для асинхронных представлений передаётся
+    decorator=aconditional.
+    """
+    stamp = stamp or partial(get_version, name)
+
+    def version(request):
+        # Метка читается один раз на запрос для ETag и Last-Modified
+        if not hasattr(request, '_data_version'):
+            request._data_version = stamp()
+        return request._data_version
+
+    def etag(request, *args, **kwargs):
+        return make_etag(name, version(request), request.get_full_path())
+
+    def last_modified(request, *args, **kwargs):
+        return datetime.fromtimestamp(version(request), tz=timezone.utc)
+
+    return decorator(etag, last_modified)
+
+
+def _recipe_state(request, pk):
+    """
+    Версии, от которых зависит представление рецепта для пользователя.
+
+    Читает только updated_at и author_id рецепта по первичному ключу;
+    результат запоминается на запросе.
+    """
+    if not hasattr(request, '_recipe_state'):
+        row = Recipe.objects.alive().filter(pk=pk).values_list(
+            'updated_at', 'author_id'
+        ).first()
+        if row is None:
+            request._recipe_state = None
+        else:
+            updated_at, author_id = row
+            user = request.user
+            names = [USER_VERSION.format(user_id=author_id),
+                     'ingredients', 'tags']
+            if user.is_authenticated:
+                names.append(USER_VERSION.format(user_id=user.pk))
+            author, ingredients, tags, *viewer = get_versions(*names)
+            versions = (
+                updated_at.timestamp(),
+                author,
+                viewer[0] if viewer else 0,
+                ingredients,
+                tags,
+            )
+            request._recipe_state = (user.pk, versions)
+    return request._recipe_state
+
+
+def _recipe_etag(request, pk=None, **kwargs):
+    state = _recipe_state(request, pk)
+    if state is None:
+        return None
+    user_id, versions = state
+    return make_etag('recipe', pk, user_id, *versions)
+
+
+def _recipe_last_modified(request, pk=None, **kwargs):
+    state = _recipe_state(request, pk)
+    if state is None:
+        return None
+    return datetime.fromtimestamp(max(state[1]), tz=timezone.utc)
+
+
+recipe_conditional = conditional(
+    _recipe_etag, _recipe_last_modified, private=True
+)
+async_recipe_conditional = aconditional(
+    _recipe_etag, _recipe_last_modified, private=True
+)
@@ -1,5 +1,6 @@
 from django_filters.rest_framework import CharFilter, FilterSet, filters
 
+from apps.api.search import full_text_search, fuzzy_search
 from apps.recipes.models import Ingredient, Recipe, Tag
 
 
@@ -11,6 +12,8 @@ class RecipeFilter(FilterSet):
         queryset=Tag.objects.all(),
         label='Tags'
     )
+    name = CharFilter(method='filter_name')
+    search = CharFilter(method='filter_search')
     is_favorited = filters.BooleanFilter(
         method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
@@ -32,11 +35,38 @@ class RecipeFilter(FilterSet):
             return queryset.filter(shopping_carts__user=user)
         return queryset
 
+    def filter_name(self, queryset, name, value):
+        return fuzzy_search(queryset, 'name', value)
+
+    def filter_search(self, queryset, name, value):
+        return full_text_search(queryset, value)
+
 
 class IngredientFilter(FilterSet):
 
-    name = CharFilter(field_name='name', lookup_expr='istartswith')
+    name = CharFilter(method='filter_name')
+    fuzzy = filters.BooleanFilter(method='filter_fuzzy')
 
     class Meta:
         model = Ingredient
         fields = ['name']
+
+    @classmethod
+    def is_fuzzy(cls, data):
+        """
+        Запрошен ли нечёткий поиск: флаг fuzzy разбирается формой
+        фильтра, как при фильтрации.
+        """
+        filterset = cls(data, queryset=Ingredient.objects.none())
+        return filterset.is_valid() and bool(
+            filterset.form.cleaned_data.get('fuzzy')
+        )
+
+    def filter_name(self, queryset, name, value):
+        if self.form.cleaned_data.get('fuzzy'):
+            return fuzzy_search(queryset, 'name', value)
+        return queryset.filter(name__istartswith=value)
+
+    def filter_fuzzy(self, queryset, name, value):
+        """Флаг режима для filter_name, сам ничего не фильтрует."""
+        return queryset
@@ -1,8 +1,135 @@
-from rest_framework.pagination import PageNumberPagination
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import (
+    Cursor,
+    CursorPagination,
+    PageNumberPagination,
+)
 
-from config.constants import DEFAULT_PAGE_SIZE
+from config.constants import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+
+class FoodgramCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация DRF: без COUNT(*), с непрозрачными курсорами.
+
+    Порядок берётся из атрибута представления cursor_ordering. Курсор
+    хранит значение только первого поля порядка (pub_date); строки
+    с одинаковым значением DRF пропускает через OFFSET, не больше
+    offset_cutoff (1000) подряд. Для ленты с составным ключом
+    (pub_date, id) — FeedPagination.
+    """
+
+    page_size = DEFAULT_PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+    ordering = ('-pub_date', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        return getattr(view, 'cursor_ordering', None) or self.ordering
 
 
 class FoodgramPagination(PageNumberPagination):
+    """
+    Постраничная пагинация с опциональным режимом курсора.
+
+    Если представление задаёт cursor_ordering, а в запросе есть параметр
+    cursor (в том числе пустой — первая страница), пагинация переходит
+    на FoodgramCursorPagination. Без него клиенты получают прежние
+    page/limit и count. Параметры из ranked_query_params представления
+    упорядочивают выдачу по релевантности, курсор заменил бы этот
+    порядок своим: вместе с ними курсор отклоняется ответом 400.
+    """
+
     page_size = DEFAULT_PAGE_SIZE
     page_size_query_param = 'limit'
+    cursor_pagination_class = FoodgramCursorPagination
+    ranked_cursor_message = (
+        'Курсорная пагинация недоступна с параметрами {params}: '
+        'результаты упорядочены по релевантности.'
+    )
+
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self._use_cursor(request, view):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def _use_cursor(self, request, view):
+        if not (
+            getattr(view, 'cursor_ordering', None)
+            and self.cursor_pagination_class.cursor_query_param
+            in request.query_params
+        ):
+            return False
+        ranked = [
+            param for param in getattr(view, 'ranked_query_params', ())
+            if request.query_params.get(param)
+        ]
+        if ranked:
+            raise ValidationError({
+                self.cursor_pagination_class.cursor_query_param: [
+                    self.ranked_cursor_message.format(
+                        params=', '.join(ranked)
+                    )
+                ]
+            })
+        return True
+
+
+class FeedPagination(FoodgramCursorPagination):
+    """
+    Курсор ленты по составному ключу (pub_date, id) без OFFSET.
+
+    Страница выбирается функцией ключей, а не queryset: лента сливает
+    записи FeedItem и рецепты знаменитостей. Только переход вперёд:
+    previous всегда null.
+    """
+
+    def paginate_keys(self, fetch_keys, request):
+        """
+        fetch_keys(позиция, число) возвращает ключи (pub_date, id)
+        после позиции; результат — ключи текущей страницы.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        position = cursor and self._parse_position(cursor.position)
+        keys = fetch_keys(position, self.page_size + 1)
+        self.has_next = len(keys) > self.page_size
+        keys = keys[:self.page_size]
+        self.next_position = keys and (
+            f'{keys[-1][0].isoformat()}|{keys[-1][1]}'
+        )
+        return keys
+
+    def _parse_position(self, position):
+        pub_date, _, recipe_id = (position or '').partition('|')
+        try:
+            pub_date = parse_datetime(pub_date)
+            recipe_id = int(recipe_id)
+        except ValueError:
+            pub_date = None
+        if pub_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return pub_date, recipe_id
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=False, position=self.next_position)
+        )
+
+    def get_previous_link(self):
+        return None
@@ -0,0 +1,141 @@
+import re
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramWordSimilarity,
+)
+from django.db import connections
+from django.db.models import Case, F, IntegerField, When
+
+from config.constants import (
+    MAX_RANKED,
+    SEARCH_CONFIG,
+    TRIGRAM_SIMILARITY_THRESHOLD,
+)
+
+WORD_RE = re.compile(r'\w+')
+# Веса полей рецепта в полнотекстовом поиске
+SEARCH_WEIGHTS = (('name', 'A', 2), ('text', 'B', 1))
+
+
+def is_postgres(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def _order_by_rank(queryset, ranked):
+    """
+    Оставляет строки из ranked (список pk) в заданном порядке; не
+    больше MAX_RANKED лучших.
+    """
+    ranked = ranked[:MAX_RANKED]
+    return queryset.filter(pk__in=ranked).order_by(
+        Case(
+            *(When(pk=pk, then=position)
+              for position, pk in enumerate(ranked)),
+            output_field=IntegerField(),
+        )
+    )
+
+
+def trigrams(value):
+    """Множество триграмм строки по правилам pg_trgm."""
+    result = set()
+    for word in WORD_RE.findall(value.lower()):
+        padded = f'  {word} '
+        result.update(
+            padded[index:index + 3] for index in range(len(padded) - 2)
+        )
+    return result
+
+
+def word_similarity(query, value):
+    """
+    Приближение word_similarity из pg_trgm: доля триграмм запроса,
+    найденных в значении.
+    """
+    query_trigrams = trigrams(query)
+    if not query_trigrams:
+        return 0
+    return len(query_trigrams & trigrams(value)) / len(query_trigrams)
+
+
+def fuzzy_search(queryset, field, value):
+    """
+    Нечёткий поиск по полю с сортировкой по степени сходства.
+
+    На PostgreSQL используется оператор pg_trgm %> (его поддерживает
+    GIN-индекс gin_trgm_ops), на других СУБД строки отбираются и
+    ранжируются на стороне Python.
+    """
+    if is_postgres(queryset):
+        return queryset.filter(
+            **{f'{field}__trigram_word_similar': value}
+        ).annotate(
+            similarity=TrigramWordSimilarity(value, field)
+        ).order_by('-similarity', *queryset.model._meta.ordering)
+
+    scored = sorted(
+        (-score, pk) for pk, text in queryset.values_list('pk', field)
+        if (score := word_similarity(value, text))
+        >= TRIGRAM_SIMILARITY_THRESHOLD
+    )
+    return _order_by_rank(queryset, [pk for _, pk in scored])
+
+
+def recipe_search_vector():
+    """Выражение tsvector рецепта: название весомее описания."""
+    vector = None
+    for field, weight, _ in SEARCH_WEIGHTS:
+        part = SearchVector(field, weight=weight, config=SEARCH_CONFIG)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def update_search_vector(queryset):
+    """Пересчитывает сохранённый tsvector рецептов (только PostgreSQL)."""
+    if is_postgres(queryset):
+        queryset.update(search_vector=recipe_search_vector())
+
+
+def _text_rank(words, recipe):
+    """Ранг рецепта для запасного поиска: все слова должны найтись."""
+    rank = 0
+    for word in words:
+        hits = sum(
+            weight * sum(token.startswith(word) for token in
+                         WORD_RE.findall(recipe[field].casefold()))
+            for field, _, weight in SEARCH_WEIGHTS
+        )
+        if not hits:
+            return 0
+        rank += hits
+    return rank
+
+
+def full_text_search(queryset, value):
+    """
+    Полнотекстовый поиск рецептов с ранжированием.
+
+    На PostgreSQL — по GIN-индексированному search_vector, на других
+    СУБД — поиск слов по началу токенов названия и описания в Python.
+    """
+    if is_postgres(queryset):
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', *queryset.model._meta.ordering)
+
+    words = [word.casefold() for word in WORD_RE.findall(value)]
+    if not words:
+        return queryset
+    fields = [field for field, _, _ in SEARCH_WEIGHTS]
+    scored = sorted(
+        (-rank, recipe['pk'])
+        for recipe in queryset.values('pk', *fields)
+        if (rank := _text_rank(words, recipe))
+    )
+    return _order_by_rank(queryset, [pk for _, pk in scored])
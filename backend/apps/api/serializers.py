@@ -1,12 +1,25 @@
+import binascii
+import json
+
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import transaction
 from djoser.serializers import UserSerializer as DjoserUserSerializer
 from drf_base64.fields import Base64ImageField
 from rest_framework import serializers
+from rest_framework.utils import html
 
+from apps.api.search import update_search_vector
+from apps.recipes import images, shopping_list
 from apps.recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from apps.users.models import Subscribe
 from config.constants import (
+    IMAGE_FORMATS,
+    IMAGE_VARIANTS,
     MAX_AMOUNT,
+    MAX_BATCH_SIZE,
     MAX_COOKING_TIME,
+    MAX_IMAGE_SIZE,
     MIN_AMOUNT,
     MIN_COOKING_TIME,
 )
@@ -34,16 +47,24 @@ class UserListSerializer(DjoserUserSerializer):
         return None
 
     def get_is_subscribed(self, obj):
+        """Берёт аннотацию queryset, а без неё проверяет подписку."""
+        is_subscribed = getattr(obj, 'is_subscribed', None)
+        if is_subscribed is not None:
+            return is_subscribed
         request = self.context.get('request')
-        return (request and request.
-                user.is_authenticated and request.
-                user.subscribing.filter(author=obj).exists())
+        return bool(
+            request
+            and request.user.is_authenticated
+            and Subscribe.objects.filter(
+                user=request.user, author=obj
+            ).exists()
+        )
 
 
 class UserSerializer(UserListSerializer):
     """Сериализатор для работы с данными пользователя."""
 
-    recipes_count = serializers.ReadOnlyField(source='recipes.count')
+    recipes_count = serializers.ReadOnlyField()
     recipes = serializers.SerializerMethodField()
 
     class Meta(UserListSerializer.Meta):
@@ -53,26 +74,70 @@ class UserSerializer(UserListSerializer):
         )
 
     def get_recipes(self, obj):
-        """Возвращает список рецептов пользователя."""
-        request = self.context.get('request')
-        recipes_limit = request.query_params.get('recipes_limit')
-        queryset = obj.recipes.all().order_by('-id')
+        """
+        Возвращает список рецептов пользователя.
+
+        Берёт рецепты, загруженные заранее в top_recipes, а без них
+        запрашивает их сам.
+        """
+        queryset = getattr(obj, 'top_recipes', None)
+        if queryset is None:
+            request = self.context.get('request')
+            recipes_limit = request.query_params.get('recipes_limit')
+            queryset = obj.recipes.alive().order_by('-id')
 
-        if recipes_limit:
-            try:
-                limit = int(recipes_limit)
-                queryset = queryset[:limit]
-            except (ValueError, TypeError):
-                pass
+            if recipes_limit:
+                try:
+                    limit = int(recipes_limit)
+                    queryset = queryset[:limit]
+                except (ValueError, TypeError):
+                    pass
 
         return ShortRecipeSerializer(
             queryset, many=True, context=self.context
         ).data
 
 
+class ImageUploadField(Base64ImageField):
+    """
+    Изображение строкой base64 или файлом multipart/form-data.
+
+    Размер строки base64 проверяется до декодирования. Повреждённое
+    изображение отклоняется здесь же: пул обработки изображений
+    только строит уменьшенные копии.
+    """
+
+    default_error_messages = {
+        'too_large': 'Размер изображения не должен превышать {max_size} МБ.',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) and data.startswith('data:'):
+            # Размер оценивается по длине строки: слишком большое
+            # изображение отклоняется, не занимая память декодированием
+            encoded = len(data) - data.find(',') - 1
+            if encoded * 3 // 4 > MAX_IMAGE_SIZE + 2:
+                self.too_large()
+        try:
+            data = self._decode(data)
+        except (ValueError, binascii.Error):
+            self.fail('invalid_image')
+        file = serializers.FileField.to_internal_value(self, data)
+        if file.size > MAX_IMAGE_SIZE:
+            self.too_large()
+        try:
+            images.identify(file)
+        except images.IMAGE_ERRORS:
+            self.fail('invalid_image')
+        return file
+
+    def too_large(self):
+        self.fail('too_large', max_size=MAX_IMAGE_SIZE // 2 ** 20)
+
+
 class AvatarSerializer(serializers.ModelSerializer):
 
-    avatar = Base64ImageField(required=True)
+    avatar = ImageUploadField(required=True)
 
     class Meta:
         model = User
@@ -120,24 +185,13 @@ class RecipeIngredientSerializer(serializers.Serializer):
         min_value=MIN_AMOUNT, max_value=MAX_AMOUNT
     )
 
-    def validate_id(self, value):
-        """Проверяет существование ингредиента по id."""
-        if not Ingredient.objects.filter(id=value).exists():
-            raise serializers.ValidationError(
-                f'Ингредиент с id={value} не существует.'
-            )
-        return value
-
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания и обновления рецептов."""
 
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True
-    )
+    tags = serializers.ListField(child=serializers.IntegerField())
     ingredients = RecipeIngredientSerializer(many=True)
-    image = Base64ImageField()
+    image = ImageUploadField()
     author = serializers.PrimaryKeyRelatedField(read_only=True)
     cooking_time = serializers.IntegerField(
         min_value=MIN_COOKING_TIME, max_value=MAX_COOKING_TIME
@@ -156,6 +210,31 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             'author'
         )
 
+    def to_internal_value(self, data):
+        """
+        В multipart/form-data ингредиенты передаются строкой JSON,
+        теги — строкой JSON или повторяющимся полем tags.
+        """
+        if html.is_html_input(data):
+            data = self._parse_form(data)
+        return super().to_internal_value(data)
+
+    @staticmethod
+    def _parse_form(data):
+        parsed = {key: data.get(key) for key in data}
+        for key in ('ingredients', 'tags'):
+            if key not in data:
+                continue
+            values = data.getlist(key)
+            try:
+                value = json.loads(values[0]) if len(values) == 1 else values
+            except ValueError:
+                raise serializers.ValidationError(
+                    {key: 'Ожидается список в формате JSON.'}
+                )
+            parsed[key] = value if isinstance(value, list) else values
+        return parsed
+
     def validate_image(self, value):
         """Проверяет, что изображение не пустое при создании."""
         if not value and self.context['request'].method == 'POST':
@@ -165,7 +244,13 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         return value
 
     def validate(self, data):
-        """Проверяет корректность данных рецепта."""
+        """
+        Проверяет корректность данных рецепта.
+
+        Существование всех ингредиентов и всех тегов проверяется одним
+        запросом IN на каждый набор; в ошибке перечислены все
+        отсутствующие id.
+        """
         ingredients = data.get('ingredients')
         if not ingredients:
             raise serializers.ValidationError(
@@ -188,19 +273,121 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 {'tags': 'Теги не должны повторяться.'}
             )
+
+        found_ingredients = Ingredient.objects.in_bulk(ingredient_ids)
+        found_tags = Tag.objects.in_bulk(tags)
+        errors = {}
+        missing = [pk for pk in ingredient_ids if pk not in found_ingredients]
+        if missing:
+            errors['ingredients'] = (
+                f'Ингредиенты не существуют: {self._join_ids(missing)}.'
+            )
+        missing = [pk for pk in tags if pk not in found_tags]
+        if missing:
+            errors['tags'] = f'Теги не существуют: {self._join_ids(missing)}.'
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        for item in ingredients:
+            item['ingredient'] = found_ingredients[item['id']]
+        data['tags'] = [found_tags[pk] for pk in tags]
         return data
 
+    @staticmethod
+    def _join_ids(ids):
+        return ', '.join(map(str, ids))
+
     def _create_ingredients(self, recipe, ingredients_data):
         """Создаёт объекты RecipeIngredient с использованием bulk_create."""
-        RecipeIngredient.objects.bulk_create(
+        return RecipeIngredient.objects.bulk_create(
             RecipeIngredient(
                 recipe=recipe,
-                ingredient_id=ingredient_data['id'],
+                ingredient=ingredient_data['ingredient'],
                 amount=ingredient_data['amount']
             )
             for ingredient_data in ingredients_data
         )
 
+    def _update_ingredients(self, recipe, ingredients_data):
+        """
+        Приводит ингредиенты рецепта к новому составу по разнице.
+
+        Удаляются только исчезнувшие строки, меняются только изменённые
+        количества, создаются только новые. Возвращает итоговые строки
+        и признак того, что состав изменился.
+        """
+        current = {
+            item.ingredient_id: item
+            for item in recipe.recipe_ingredients.order_by()
+        }
+        old_amounts = {key: item.amount for key, item in current.items()}
+        new_amounts = {item['id']: item['amount'] for item in ingredients_data}
+
+        removed = current.keys() - new_amounts.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        created, changed, result = [], [], []
+        for ingredient_data in ingredients_data:
+            item = current.get(ingredient_data['id'])
+            if item is None:
+                item = RecipeIngredient(recipe=recipe,
+                                        amount=ingredient_data['amount'])
+                created.append(item)
+            elif item.amount != ingredient_data['amount']:
+                item.amount = ingredient_data['amount']
+                changed.append(item)
+            item.ingredient = ingredient_data['ingredient']
+            result.append(item)
+        RecipeIngredient.objects.bulk_create(created)
+        RecipeIngredient.objects.bulk_update(changed, ['amount'])
+
+        shopping_list.change_recipe(recipe.pk, old_amounts, new_amounts)
+        return result, bool(removed or created or changed)
+
+    def _update_tags(self, recipe, tags):
+        """Добавляет и удаляет только изменившиеся теги рецепта."""
+        through = Recipe.tags.through
+        current = set(
+            through.objects.filter(recipe=recipe)
+            .values_list('tag_id', flat=True)
+        )
+        new = {tag.pk for tag in tags}
+        if current - new:
+            through.objects.filter(
+                recipe=recipe, tag_id__in=current - new
+            ).delete()
+        through.objects.bulk_create(
+            through(recipe=recipe, tag_id=pk) for pk in new - current
+        )
+        return current != new
+
+    def _cache_relations(self, recipe, recipe_ingredients, tags):
+        """
+        Запоминает записанные связи рецепта для построения ответа.
+
+        Порядок берётся из БД теми же запросами с Meta.ordering, что и
+        при чтении: сортировка в Python не совпала бы с правилами
+        сравнения (collation) БД, и ответ на запись расходился бы
+        с последующим GET. Читаются только первичные ключи.
+        """
+        items = {item.ingredient_id: item for item in recipe_ingredients}
+        tags = {tag.pk: tag for tag in tags}
+        self._relations = {
+            'recipe_ingredients': [
+                items[pk] for pk in RecipeIngredient.objects.filter(
+                    recipe=recipe
+                ).values_list('ingredient_id', flat=True)
+            ],
+            'tags': [
+                tags[pk] for pk in Tag.objects.filter(
+                    pk__in=tags
+                ).values_list('pk', flat=True)
+            ],
+        }
+
+    @transaction.atomic
     def create(self, validated_data):
         """Создает новый рецепт."""
         ingredients_data = validated_data.pop('ingredients')
@@ -209,31 +396,107 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             author=self.context['request'].user,
             **validated_data
         )
-        recipe.tags.set(tags)
-        self._create_ingredients(recipe, ingredients_data)
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag) for tag in tags
+        )
+        recipe_ingredients = self._create_ingredients(
+            recipe, ingredients_data
+        )
+        update_search_vector(Recipe.objects.filter(pk=recipe.pk))
+        images.schedule_variants(recipe.pk)
+
+        self._cache_relations(recipe, recipe_ingredients, tags)
+        recipe.is_favorited = False
+        recipe.is_in_shopping_cart = False
+        recipe.author_is_subscribed = False
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        """Обновляет существующий рецепт."""
+        """
+        Обновляет существующий рецепт.
+
+        Пишутся только изменившиеся поля и связи; если не изменилось
+        ничего, рецепт не сохраняется вовсе.
+        """
         ingredients_data = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
 
-        instance.tags.set(tags)
-        instance.recipe_ingredients.all().delete()
-        self._create_ingredients(instance, ingredients_data)
-
-        return super().update(instance, validated_data)
+        recipe_ingredients, ingredients_changed = self._update_ingredients(
+            instance, ingredients_data
+        )
+        tags_changed = self._update_tags(instance, tags)
+        update_fields = [
+            field for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        for field in update_fields:
+            setattr(instance, field, validated_data[field])
+        if update_fields or ingredients_changed or tags_changed:
+            instance.save(update_fields=[*update_fields, 'updated_at'])
+        if {'name', 'text'} & set(update_fields):
+            update_search_vector(Recipe.objects.filter(pk=instance.pk))
+        if 'image' in update_fields:
+            images.schedule_variants(instance.pk)
+
+        self._cache_relations(instance, recipe_ingredients, tags)
+        flags = Recipe.objects.filter(pk=instance.pk).with_user_flags(
+            self.context['request'].user
+        ).values(
+            'is_favorited', 'is_in_shopping_cart', 'author_is_subscribed'
+        ).get()
+        for flag, value in flags.items():
+            setattr(instance, flag, value)
+        return instance
 
     def to_representation(self, instance):
-        """Преобразует рецепт в JSON-представление."""
+        """
+        Преобразует рецепт в JSON-представление.
+
+        После записи связи берутся из проверенных данных через кеш
+        предзагрузки (UpdateModelMixin сбрасывает его после сохранения),
+        поэтому ответ не перечитывает их из БД.
+        """
+        relations = getattr(self, '_relations', None)
+        if relations is not None:
+            instance._prefetched_objects_cache = dict(relations)
         return RecipeSerializer(instance, context=self.context).data
 
 
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    Ссылки на варианты изображения: {вариант: {формат: url}}.
+
+    Пока варианты не построены, каждая ссылка ведёт на оригинал.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.image:
+            return None
+        request = self.context.get('request')
+        build = request.build_absolute_uri if request else str
+        variants = recipe.image_variants or {}
+        original = build(recipe.image.url)
+        return {
+            variant: {
+                extension: (build(default_storage.url(variants[variant][
+                    extension])) if variant in variants else original)
+                for _, extension, _ in IMAGE_FORMATS
+            }
+            for variant in IMAGE_VARIANTS
+        }
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для отображения рецептов."""
 
     tags = TagSerializer(many=True, read_only=True)
     author = UserListSerializer(read_only=True)
+    image_variants = ImageVariantsField()
     ingredients = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
@@ -249,6 +512,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time'
         )
@@ -266,10 +530,20 @@ class RecipeSerializer(serializers.ModelSerializer):
             for ri in recipe_ingredients
         ]
 
-    def _check_user_relation(self, obj, related_manager_name):
+    def to_representation(self, instance):
+        """Передаёт аннотацию подписки на автора во вложенный сериализатор."""
+        is_subscribed = getattr(instance, 'author_is_subscribed', None)
+        if is_subscribed is not None:
+            instance.author.is_subscribed = is_subscribed
+        return super().to_representation(instance)
+
+    def _check_user_relation(self, obj, related_manager_name, annotation):
         """Общий метод для проверки отношений пользователя с рецептом."""
+        value = getattr(obj, annotation, None)
+        if value is not None:
+            return value
         request = self.context.get('request')
-        return (
+        return bool(
             request
             and request.user.is_authenticated
             and getattr(obj, related_manager_name
@@ -278,15 +552,29 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     def get_is_favorited(self, obj):
         """Проверяет, добавлен ли рецепт в избранное."""
-        return self._check_user_relation(obj, 'favorites')
+        return self._check_user_relation(obj, 'favorites', 'is_favorited')
 
     def get_is_in_shopping_cart(self, obj):
         """Проверяет, добавлен ли рецепт в список покупок."""
-        return self._check_user_relation(obj, 'shopping_carts')
+        return self._check_user_relation(
+            obj, 'shopping_carts', 'is_in_shopping_cart'
+        )
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для пакетных операций с коллекциями."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BATCH_SIZE
+    )
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
 
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
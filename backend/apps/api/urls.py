@@ -1,14 +1,18 @@
+from django.conf import settings
 from django.urls import include, path
 from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 from rest_framework.routers import DefaultRouter
 
+from apps.api import async_views
 from apps.api.views import (
     IngredientViewSet,
     RecipeViewSet,
     TagViewSet,
     UserViewSet,
+    health,
+    readiness,
 )
 
 schema_view = get_schema_view(
@@ -46,7 +50,46 @@ router.register('tags', TagViewSet, basename='tags')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 router.register('users', UserViewSet, basename='users')
 
-urlpatterns = [
+# Под ASGI читающие эндпоинты обслуживаются асинхронными реализациями,
+# записи по тем же адресам передаются синхронным представлениям DRF
+async_patterns = [
+    path('tags/', async_views.read_view(
+        async_views.tag_list, TagViewSet.as_view({'get': 'list'})
+    )),
+    path('tags/<int:pk>/', async_views.read_view(
+        async_views.tag_detail, TagViewSet.as_view({'get': 'retrieve'})
+    )),
+    path('ingredients/', async_views.read_view(
+        async_views.ingredient_list,
+        IngredientViewSet.as_view({'get': 'list'})
+    )),
+    path('ingredients/<int:pk>/', async_views.read_view(
+        async_views.ingredient_detail,
+        IngredientViewSet.as_view({'get': 'retrieve'})
+    )),
+    path('recipes/', async_views.read_view(
+        async_views.recipe_list,
+        RecipeViewSet.as_view({'get': 'list', 'post': 'create'})
+    )),
+    path('recipes/<int:pk>/', async_views.read_view(
+        async_views.recipe_detail,
+        RecipeViewSet.as_view({
+            'get': 'retrieve',
+            'put': 'update',
+            'patch': 'partial_update',
+            'delete': 'destroy',
+        })
+    )),
+    path('recipes/<int:pk>/get-link/', async_views.read_view(
+        async_views.recipe_get_link,
+        RecipeViewSet.as_view({'get': 'get_link'})
+    )),
+]
+
+urlpatterns = async_patterns if settings.ASYNC_VIEWS else []
+urlpatterns += [
+    path('health/', health, name='health'),
+    path('health/ready/', readiness, name='readiness'),
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
 
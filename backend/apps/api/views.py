@@ -1,11 +1,20 @@
 from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
-from django.db.models import F, Sum
+from django.core.cache import cache
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import F, Prefetch, Value
+from django.http import StreamingHttpResponse
+from django.utils.decorators import method_decorator
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import status, viewsets
-from rest_framework.decorators import action
+from rest_framework.decorators import (
+    action,
+    api_view,
+    authentication_classes,
+    permission_classes,
+)
 from rest_framework.permissions import (
     AllowAny,
     IsAuthenticated,
@@ -13,34 +22,43 @@ from rest_framework.permissions import (
 )
 from rest_framework.response import Response
 
+from apps.api.autocomplete import ingredient_index
+from apps.api.conditional import recipe_conditional, versioned
 from apps.api.filters import IngredientFilter, RecipeFilter
-from apps.api.pagination import FoodgramPagination
+from apps.api.pagination import FeedPagination, FoodgramPagination
 from apps.api.permissions import IsAuthorOrReadOnly
+from apps.api.renderers import SHOPPING_LIST_RENDERERS
 from apps.api.serializers import (
     AvatarSerializer,
     IngredientSerializer,
     RecipeCreateSerializer,
+    RecipeIdsSerializer,
     RecipeSerializer,
     ShortRecipeSerializer,
     TagSerializer,
     UserListSerializer,
     UserSerializer,
 )
+from apps.recipes import deletion, recipe_collections, timelines
 from apps.recipes.models import (
     Favorite,
     Ingredient,
     Recipe,
-    RecipeIngredient,
     ShoppingCart,
+    ShoppingListItem,
     Tag,
 )
 from apps.users.models import Subscribe
-from config.constants import SAFE_METHODS
+from config.constants import SAFE_METHODS, SHOPPING_LIST_CHUNK_SIZE
 
 User = get_user_model()
 
+HEALTH_CACHE_KEY = 'foodgram:health'
+
 
 # Вью для рецептов
+@method_decorator(versioned('tags'), name='list')
+@method_decorator(versioned('tags'), name='retrieve')
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     """Представление для работы с тегами."""
 
@@ -50,6 +68,10 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
 
 
+@method_decorator(
+    versioned('ingredients', stamp=ingredient_index.version), name='list'
+)
+@method_decorator(versioned('ingredients'), name='retrieve')
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     """Представление для работы с ингредиентами."""
 
@@ -60,7 +82,21 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        """
+        Отдаёт ингредиенты из индекса в памяти, не обращаясь к БД.
+
+        Параметр name ищет по началу названия, затем по подстроке.
+        Нечёткий поиск (fuzzy) выполняется фильтром через БД.
+        """
+        if IngredientFilter.is_fuzzy(request.query_params):
+            return super().list(request, *args, **kwargs)
+        return Response(
+            ingredient_index.search(request.query_params.get('name', ''))
+        )
+
 
+@method_decorator(recipe_conditional, name='retrieve')
 class RecipeViewSet(viewsets.ModelViewSet):
     """Представление для работы с рецептами."""
 
@@ -68,14 +104,56 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
     pagination_class = FoodgramPagination
+    cursor_ordering = ('-pub_date', '-id')
+    # Фильтры RecipeFilter с сортировкой по релевантности
+    ranked_query_params = ('name', 'search')
     permission_classes = [IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
 
+    def get_queryset(self):
+        """
+        Возвращает рецепты со всеми данными для отображения.
+
+        Флаги пользователя считаются подзапросами EXISTS, а связи
+        подгружаются заранее, поэтому число запросов не зависит
+        от размера страницы.
+        """
+        if self.action not in ('list', 'retrieve', 'feed'):
+            return Recipe.objects.alive().select_related('author')
+        return Recipe.objects.alive().for_display(self.request.user)
+
     def get_serializer_class(self):
         """Возвращает соответствующий сериализатор для действия."""
         if self.request.method in SAFE_METHODS:
             return RecipeSerializer
         return RecipeCreateSerializer
 
+    def perform_destroy(self, instance):
+        """Скрывает рецепт сразу, связи удаляются в фоне."""
+        deletion.delete_recipe(instance)
+
+    @action(detail=False, methods=['get'],
+            permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        """
+        Лента рецептов авторов, на которых подписан пользователь.
+
+        Рецепты берутся из FeedItem, куда они разносятся при публикации,
+        и у знаменитостей напрямую; пагинация всегда курсорная по
+        ключу (pub_date, id).
+        """
+        paginator = FeedPagination()
+        keys = paginator.paginate_keys(
+            lambda position, limit: timelines.feed_keys(
+                request.user, position, limit
+            ),
+            request,
+        )
+        recipes = self.get_queryset().in_bulk([pk for _, pk in keys])
+        serializer = self.get_serializer(
+            [recipes[pk] for _, pk in keys if pk in recipes], many=True
+        )
+        return paginator.get_paginated_response(serializer.data)
+
     @action(detail=True,
             methods=['get'],
             permission_classes=[AllowAny],
@@ -128,14 +206,72 @@ class RecipeViewSet(viewsets.ModelViewSet):
                                             model,
                                             error_messages)
 
+    @action(detail=False, methods=['post', 'delete'],
+            permission_classes=[IsAuthenticated],
+            url_path='favorite/batch')
+    def favorite_batch(self, request):
+        """Пакетно добавляет/удаляет рецепты в избранное."""
+        return self._batch_collection(request, Favorite)
+
+    @action(detail=False, methods=['post', 'delete'],
+            permission_classes=[IsAuthenticated],
+            url_path='shopping_cart/batch')
+    def shopping_cart_batch(self, request):
+        """Пакетно добавляет/удаляет рецепты в список покупок."""
+        return self._batch_collection(request, ShoppingCart)
+
+    def _batch_collection(self, request, model):
+        """
+        Идемпотентно добавляет или удаляет пачку рецептов.
+
+        Повторное добавление и удаление отсутствующего не считаются
+        ошибкой: ответ перечисляет, что изменилось.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['recipes']))
+        found = set(
+            Recipe.objects.alive().filter(pk__in=ids).values_list(
+                'pk', flat=True
+            )
+        )
+        recipe_ids = [pk for pk in ids if pk in found]
+        not_found = [pk for pk in ids if pk not in found]
+
+        if request.method == 'POST':
+            added, existing = recipe_collections.bulk_add(
+                model, request.user, recipe_ids
+            )
+            return Response(
+                {'added': added, 'existing': existing,
+                 'not_found': not_found},
+                status=(status.HTTP_201_CREATED if added
+                        else status.HTTP_200_OK)
+            )
+        removed = recipe_collections.bulk_remove(
+            model, request.user, recipe_ids
+        )
+        return Response(
+            {'removed': removed,
+             'not_found': [pk for pk in ids if pk not in removed]},
+            status=status.HTTP_200_OK
+        )
+
     def _add_to_collection(self, user, recipe, model, error_messages):
-        """Добавляет рецепт в указанную коллекцию."""
-        if model.objects.filter(user=user, recipe=recipe).exists():
+        """
+        Добавляет рецепт в указанную коллекцию.
+
+        Один INSERT без предварительной проверки: повтор ловится
+        уникальным ограничением.
+        """
+        try:
+            with transaction.atomic():
+                model.objects.create(user=user, recipe=recipe)
+        except IntegrityError:
             return Response(
                 {'error': error_messages['exists']},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        model.objects.create(user=user, recipe=recipe)
         serializer = ShortRecipeSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -153,37 +289,43 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, methods=['get'],
-            permission_classes=[IsAuthenticated])
+            permission_classes=[IsAuthenticated],
+            renderer_classes=SHOPPING_LIST_RENDERERS)
     def download_shopping_cart(self, request):
-        """Скачивает список покупок."""
+        """
+        Скачивает список покупок.
+
+        Формат выбирается параметром format (txt, csv, json) или
+        заголовком Accept; строки отдаются потоком.
+        """
         shopping_data = self._get_shopping_cart_data(request.user)
-        shopping_list = self._format_shopping_list(shopping_data)
-        return self._create_file_response(shopping_list)
+        return self._create_file_response(
+            request.accepted_renderer, shopping_data
+        )
 
     def _get_shopping_cart_data(self, user):
-        """Получает данные списка покупок одним запросом."""
-        return RecipeIngredient.objects.filter(
-            recipe__shopping_carts__user=user
-        ).values(
+        """Читает готовый список покупок пользователя по индексу."""
+        return ShoppingListItem.objects.filter(user=user).values(
+            'total_amount',
             name=F('ingredient__name'),
             unit=F('ingredient__measurement_unit')
-        ).annotate(
-            total_amount=Sum('amount')
         ).order_by('ingredient__name')
 
-    def _format_shopping_list(self, shopping_data):
-        """Форматирует данные в текстовый список."""
-        shopping_list = "Список покупок:\n\n"
-        for item in shopping_data:
-            shopping_list += (f"- {item['name']}: "
-                              f"{item['total_amount']} {item['unit']}\n")
-        return shopping_list
-
-    def _create_file_response(self, shopping_list):
-        """Создает файловый ответ для скачивания."""
-        response = Response(shopping_list, content_type='text/plain')
+    def _create_file_response(self, renderer, shopping_data):
+        """
+        Создает потоковый файловый ответ для скачивания.
+
+        Строки читаются итератором (на PostgreSQL — серверным курсором),
+        поэтому список не собирается в памяти целиком.
+        """
+        response = StreamingHttpResponse(
+            renderer.stream(
+                shopping_data.iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
+            ),
+            content_type=f'{renderer.media_type}; charset=utf-8'
+        )
         response['Content-Disposition'] = (
-            'attachment; filename="shopping_list.txt"')
+            f'attachment; filename="shopping_list.{renderer.format}"')
         return response
 
 
@@ -192,8 +334,17 @@ class UserViewSet(DjoserUserViewSet):
     """Наследуем всю базовую функциональность от Djoser."""
 
     pagination_class = FoodgramPagination
+    cursor_ordering = ('-id',)
     permission_classes = [AllowAny]
 
+    def get_queryset(self):
+        """Пользователи, не помеченные на удаление."""
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+    def perform_destroy(self, instance):
+        """Скрывает пользователя сразу, связи удаляются в фоне."""
+        deletion.delete_user(instance)
+
     @action(detail=False, methods=['get'],
             permission_classes=[IsAuthenticated])
     def me(self, request, *args, **kwargs):
@@ -208,7 +359,8 @@ class UserViewSet(DjoserUserViewSet):
         """Обновляет или удаляет аватар текущего пользователя."""
         if request.method == 'DELETE':
             if request.user.avatar:
-                request.user.avatar.delete()
+                # Файл не удаляется: при хранении по содержимому он может
+                # принадлежать другим объектам
                 request.user.avatar = None
                 request.user.save()
             return Response(status=status.HTTP_204_NO_CONTENT)
@@ -228,6 +380,30 @@ class UserViewSet(DjoserUserViewSet):
         serializer.save()
         return Response(serializer.data, status=HTTPStatus.OK)
 
+    def _with_recipes(self, authors):
+        """
+        Авторы, на которых подписан пользователь, с последними
+        recipes_limit рецептами.
+
+        Рецепты всех авторов страницы загружаются одним запросом:
+        срез в Prefetch выполняется оконной функцией ROW_NUMBER()
+        OVER (PARTITION BY author_id). Число рецептов берётся из
+        счётчика recipes_count.
+        """
+        recipes = Recipe.objects.alive().only(
+            'id', 'author_id', 'name', 'image', 'image_variants',
+            'cooking_time'
+        ).order_by('-id')
+        try:
+            recipes = recipes[:int(
+                self.request.query_params['recipes_limit']
+            )]
+        except (KeyError, ValueError):
+            pass
+        return authors.annotate(is_subscribed=Value(True)).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='top_recipes')
+        )
+
     @action(detail=True,
             methods=['post', 'delete'],
             permission_classes=[IsAuthenticated])
@@ -248,6 +424,9 @@ class UserViewSet(DjoserUserViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             Subscribe.objects.create(user=request.user, author=author)
+            author = self._with_recipes(
+                User.objects.filter(pk=author.pk)
+            ).get()
             serializer = UserSerializer(author, context={'request': request})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -266,21 +445,53 @@ class UserViewSet(DjoserUserViewSet):
             permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
         """Возвращает список авторов, на которых подписан пользователь."""
-        try:
-            user = request.user
-            authors = User.objects.filter(subscribing__user=user)
-            page = self.paginate_queryset(authors)
-            if page is not None:
-                serializer = UserSerializer(
-                    page, many=True, context={'request': request}
-                )
-                return self.get_paginated_response(serializer.data)
-            serializer = UserSerializer(
-                authors, many=True, context={'request': request}
+        authors = self._with_recipes(
+            User.objects.filter(
+                subscribing__user=request.user, deleted_at__isnull=True
             )
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except Exception:
-            return Response(
-                {'error': 'Internal server error'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+        page = self.paginate_queryset(authors)
+        if page is not None:
+            serializer = UserSerializer(
+                page, many=True, context={'request': request}
             )
+            return self.get_paginated_response(serializer.data)
+        serializer = UserSerializer(
+            authors, many=True, context={'request': request}
+        )
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+# Проверки состояния для оркестратора и балансировщика
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def health(request):
+    """Процесс жив и обслуживает запросы; БД и кеш не проверяются."""
+    return Response({'status': 'ok'})
+
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def readiness(request):
+    """Готовность принимать трафик: доступны БД и кеш."""
+    checks = {}
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        checks['database'] = 'ok'
+    except DatabaseError:
+        checks['database'] = 'error'
+    try:
+        cache.set(HEALTH_CACHE_KEY, 1, 10)
+        cache_ok = cache.get(HEALTH_CACHE_KEY) == 1
+    except Exception:
+        cache_ok = False
+    checks['cache'] = 'ok' if cache_ok else 'error'
+    ready = all(result == 'ok' for result in checks.values())
+    return Response(
+        {'status': 'ok' if ready else 'error', 'checks': checks},
+        status=(status.HTTP_200_OK if ready
+                else status.HTTP_503_SERVICE_UNAVAILABLE)
+    )
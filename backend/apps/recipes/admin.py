@@ -2,9 +2,10 @@ from django.contrib import admin
 from django.core.exceptions import ValidationError
 from django.forms import BaseInlineFormSet
 
+from apps.api.search import update_search_vector
 from config.constants import DEFAULT_EXTRA_FORMS, MIN_REQUIRED_FORMS
 
-from . import models
+from . import images, models, shopping_list
 
 
 class RecipeIngredientInlineFormSet(BaseInlineFormSet):
@@ -66,7 +67,21 @@ class RecipeAdmin(admin.ModelAdmin):
 
     @admin.display(description="В избранном")
     def in_favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
+
+    def save_related(self, request, form, formsets, change):
+        old_amounts = shopping_list.recipe_amounts(form.instance.pk)
+        super().save_related(request, form, formsets, change)
+        shopping_list.change_recipe(
+            form.instance.pk,
+            old_amounts,
+            shopping_list.recipe_amounts(form.instance.pk)
+        )
+        update_search_vector(
+            models.Recipe.objects.filter(pk=form.instance.pk)
+        )
+        if 'image' in form.changed_data:
+            images.schedule_variants(form.instance.pk)
 
 
 @admin.register(models.RecipeIngredient)
@@ -85,3 +100,9 @@ class FavoriteAdmin(admin.ModelAdmin):
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ("pk", "user", "recipe")
     list_editable = ("user", "recipe")
+
+
+@admin.register(models.ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ("pk", "user", "ingredient", "total_amount")
+    list_filter = ("user",)
@@ -5,3 +5,15 @@ class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.recipes'
     verbose_name = 'Рецепты'
+
+    def ready(self):
+        from apps.recipes.signals import (
+            connect_counters,
+            connect_shopping_lists,
+            connect_timelines,
+            connect_versions,
+        )
+        connect_counters()
+        connect_versions()
+        connect_shopping_lists()
+        connect_timelines()
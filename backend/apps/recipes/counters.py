@@ -0,0 +1,56 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from apps.recipes.models import Favorite, Recipe, ShoppingCart
+from apps.users.models import Subscribe, User
+
+# (модель со счётчиком, поле счётчика, считаемая модель, внешний ключ)
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'cart_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', Subscribe, 'author'),
+)
+# Какие строки считаемой модели учитываются: помеченные удалёнными
+# рецепты и связи помеченных пользователей вычитаются из счётчиков
+# при пометке (apps.recipes.deletion)
+VISIBLE = {
+    Favorite: {'user__deleted_at__isnull': True},
+    ShoppingCart: {'user__deleted_at__isnull': True},
+    Recipe: {'deleted_at__isnull': True},
+    Subscribe: {'user__deleted_at__isnull': True},
+}
+
+
+def shift_counter(model, pk, field, delta):
+    """Атомарно изменяет счётчик на delta, не опуская его ниже нуля."""
+    shift_counters(model, [pk], field, delta)
+
+
+def shift_counters(model, pks, field, delta):
+    """Изменяет счётчик сразу у пачки строк одним UPDATE."""
+    model.objects.filter(pk__in=pks).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def counter_field(target, source):
+    """Поле счётчика target, которое считает строки source."""
+    for counter_target, field, counter_source, _ in COUNTERS:
+        if counter_target is target and counter_source is source:
+            return field
+    raise LookupError(f'{target.__name__} не считает {source.__name__}')
+
+
+def actual_count(source, fk):
+    """Подзапрос с фактическим числом видимых связанных строк."""
+    return Coalesce(
+        Subquery(
+            source.objects.filter(**{fk: OuterRef('pk')}, **VISIBLE[source])
+            .order_by()
+            .values(fk)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0
+    )
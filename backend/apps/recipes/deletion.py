@@ -0,0 +1,341 @@
+"""
+Отложенное удаление рецептов и пользователей.
+
+Удаляемые строки сразу помечаются deleted_at, и API их больше не
+показывает; пользователь к тому же деактивируется и теряет доступ
+по токену. В той же транзакции ингредиенты помеченных рецептов
+вычитаются из списков покупок тех, у кого рецепт в корзине, а из
+счётчиков видимых строк (рецепты автора, избранное и корзины
+рецептов, подписчики авторов) вычитаются помеченные рецепты и связи
+помеченных пользователей. Зависимые строки (избранное, корзины,
+ингредиенты, теги, ленты, подписки) удаляются в фоне пачками по
+DELETION_CHUNK_SIZE, каждая пачка в своей транзакции одним DELETE.
+Как и в recipe_collections, сигналы при этом не посылаются; счётчики
+и списки покупок очистка уже не трогает, метки версий сдвигаются
+сразу для всей пачки.
+
+Пометки хранятся в базе: если фоновая очистка прервалась, её
+продолжает команда purge_deleted.
+"""
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from apps.recipes import shopping_list
+from apps.recipes.counters import counter_field, shift_counters
+from apps.recipes.models import (
+    Favorite,
+    FeedItem,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    ShoppingListItem,
+)
+from apps.recipes.versions import USER_VERSION, bump_versions
+from apps.users.models import Subscribe, User
+from config.constants import DELETION_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Блокировка объекта на время очистки, чтобы фоновые потоки всех
+# контейнеров и purge_deleted не удаляли одни и те же строки дважды.
+# На PostgreSQL это advisory-блокировка сессии с ключом
+# (pk << 2) | LOCK_KINDS[вид], на SQLite — ключ LOCK_KEY в кеше
+LOCK_KINDS = {'recipe': 1, 'user': 2}
+LOCK_KEY = 'foodgram:purge:{}:{}'
+LOCK_SECONDS = 60 * 60
+# Как часто purge сообщает о ходе очистки
+PROGRESS_EVERY = 100
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Поток фоновой очистки, создаётся при первом вызове. Один поток:
+    очистки выполняются по очереди и не нагружают базу параллельно.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='deletion',
+            )
+    return _executor
+
+
+@transaction.atomic
+def delete_recipe(recipe):
+    """Помечает рецепт удалённым и ставит его очистку в фон."""
+    if Recipe.objects.alive().filter(pk=recipe.pk).update(
+        deleted_at=timezone.now(), updated_at=timezone.now()
+    ):
+        shift_counters(
+            User, [recipe.author_id], counter_field(User, Recipe), -1
+        )
+        _remove_from_lists([recipe.pk])
+    _schedule(purge_recipe, recipe.pk)
+
+
+def mark_users(queryset):
+    """
+    Помечает пользователей и их рецепты удалёнными и деактивирует
+    пользователей. Возвращает число помеченных пользователей.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(queryset.filter(deleted_at__isnull=True).values_list(
+            'pk', flat=True
+        ))
+        recipes = Recipe.objects.alive().filter(author_id__in=ids)
+        recipe_ids = list(recipes.values_list('pk', flat=True))
+        _unshift(User, Recipe, 'author', recipes)
+        for model, source, fk in (
+            (Recipe, Favorite, 'recipe'),
+            (Recipe, ShoppingCart, 'recipe'),
+            (User, Subscribe, 'author'),
+        ):
+            _unshift(model, source, fk,
+                     source.objects.filter(user_id__in=ids))
+        recipes.update(deleted_at=now, updated_at=now)
+        _remove_from_lists(recipe_ids)
+        return User.objects.filter(pk__in=ids).update(
+            deleted_at=now, is_active=False
+        )
+
+
+def delete_user(user):
+    """Помечает пользователя удалённым и ставит его очистку в фон."""
+    mark_users(User.objects.filter(pk=user.pk))
+    _schedule(purge_user, user.pk)
+
+
+def _unshift(model, source, fk, queryset):
+    """
+    Вычитает строки queryset модели source из счётчиков model по
+    внешнему ключу fk; строки с одинаковой разницей — одним UPDATE
+    на пачку.
+    """
+    field = counter_field(model, source)
+    pks = defaultdict(list)
+    for pk, total in queryset.order_by().values(fk).annotate(
+        total=Count('pk')
+    ).values_list(fk, 'total'):
+        pks[total].append(pk)
+    for total, group in pks.items():
+        for start in range(0, len(group), DELETION_CHUNK_SIZE):
+            shift_counters(
+                model, group[start:start + DELETION_CHUNK_SIZE], field,
+                -total,
+            )
+
+
+def _remove_from_lists(recipe_ids):
+    """
+    Вычитает помеченные рецепты из списков покупок пользователей,
+    у которых они в корзине. Строки корзин удаляет фоновая очистка,
+    уже не трогая списки.
+    """
+    for start in range(0, len(recipe_ids), DELETION_CHUNK_SIZE):
+        ids = recipe_ids[start:start + DELETION_CHUNK_SIZE]
+        deltas = defaultdict(dict)
+        for recipe_id, ingredient_id, amount in (
+            RecipeIngredient.objects.filter(recipe_id__in=ids)
+            .values_list('recipe_id', 'ingredient_id', 'amount')
+        ):
+            deltas[recipe_id][ingredient_id] = -amount
+        carts = list(ShoppingCart.objects.filter(
+            recipe_id__in=ids
+        ).values('user_id', 'recipe_id'))
+        users = defaultdict(list)
+        for row in carts:
+            users[row['recipe_id']].append(row['user_id'])
+        for recipe_id, user_ids in users.items():
+            shopping_list.apply_deltas(user_ids, deltas[recipe_id])
+        _bump_users(carts)
+
+
+def _schedule(task, pk):
+    transaction.on_commit(lambda: get_executor().submit(_run, task, pk))
+
+
+def _run(task, pk):
+    try:
+        task(pk)
+    except Exception:
+        logger.exception('Не удалось очистить %s %s', task.__name__, pk)
+    finally:
+        close_old_connections()
+
+
+def _delete_chunked(queryset, after=None, fields=()):
+    """
+    Удаляет строки пачками, каждую в своей транзакции одним DELETE
+    без сигналов. after(строки) применяет их эффекты ко всей пачке;
+    строки — словари со значениями pk и fields.
+    """
+    while True:
+        with transaction.atomic():
+            rows = list(queryset.select_for_update().order_by('pk').values(
+                'pk', *fields
+            )[:DELETION_CHUNK_SIZE])
+            if not rows:
+                return
+            _delete_rows(queryset.model, [row['pk'] for row in rows])
+            if after:
+                after(rows)
+
+
+def _delete_rows(model, pks):
+    """Один DELETE по первичным ключам, без сбора объектов и сигналов."""
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} '
+            f'WHERE {quote(model._meta.pk.column)} '
+            f'IN ({", ".join(["%s"] * len(pks))})',
+            pks,
+        )
+
+
+def _bump_users(rows, field='user_id'):
+    user_ids = {row[field] for row in rows}
+    transaction.on_commit(lambda: bump_versions(
+        USER_VERSION.format(user_id=user_id) for user_id in user_ids
+    ))
+
+
+def _lock(kind, pk):
+    """Берёт блокировку очистки объекта, не дожидаясь её."""
+    if connection.vendor != 'postgresql':
+        return cache.add(LOCK_KEY.format(kind, pk), True, LOCK_SECONDS)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_lock(%s)',
+                       [pk << 2 | LOCK_KINDS[kind]])
+        return cursor.fetchone()[0]
+
+
+def _unlock(kind, pk):
+    if connection.vendor != 'postgresql':
+        cache.delete(LOCK_KEY.format(kind, pk))
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_unlock(%s)',
+                       [pk << 2 | LOCK_KINDS[kind]])
+
+
+def _locked(kind):
+    """
+    Очистка объекта под блокировкой (см. LOCK_KINDS); если объект уже
+    очищается в другом месте, возвращает False.
+    """
+
+    def decorator(purge):
+
+        @wraps(purge)
+        def wrapper(pk):
+            if not _lock(kind, pk):
+                return False
+            try:
+                purge(pk)
+            finally:
+                _unlock(kind, pk)
+            return True
+
+        return wrapper
+
+    return decorator
+
+
+def _purge_recipes(recipe_ids):
+    """
+    Удаляет помеченные рецепты по DELETION_CHUNK_SIZE за раз: сначала
+    зависимые строки пачками, затем сами рецепты. Счётчики и списки
+    покупок уже обновлены при пометке.
+    """
+    for start in range(0, len(recipe_ids), DELETION_CHUNK_SIZE):
+        ids = recipe_ids[start:start + DELETION_CHUNK_SIZE]
+        for model in (Favorite, ShoppingCart):
+            _delete_chunked(
+                model.objects.filter(recipe_id__in=ids),
+                _bump_users, ('user_id',),
+            )
+        for model in (FeedItem, RecipeIngredient, Recipe.tags.through):
+            _delete_chunked(model.objects.filter(recipe_id__in=ids))
+        # Без сигналов: recipes_count автора уменьшен при пометке
+        _delete_chunked(Recipe.objects.filter(
+            pk__in=ids, deleted_at__isnull=False
+        ))
+
+
+@_locked('recipe')
+def purge_recipe(recipe_id):
+    """Удаляет помеченный рецепт и его связи."""
+    _purge_recipes([recipe_id])
+
+
+@_locked('user')
+def purge_user(user_id):
+    """
+    Удаляет помеченного пользователя, его рецепты и связи. Счётчики
+    обновлены при пометке, список покупок пользователя не обновляется.
+    """
+    _purge_recipes(list(
+        Recipe.objects.filter(author_id=user_id).order_by('pk')
+        .values_list('pk', flat=True)
+    ))
+    for model in (Favorite, ShoppingCart, Subscribe):
+        _delete_chunked(model.objects.filter(user_id=user_id))
+    # Рецепты автора уже удалены вместе с записями лент подписчиков
+    _delete_chunked(
+        Subscribe.objects.filter(author_id=user_id),
+        _bump_users, ('user_id',),
+    )
+    for model in (FeedItem, ShoppingListItem):
+        _delete_chunked(model.objects.filter(user_id=user_id))
+    User.objects.filter(pk=user_id, deleted_at__isnull=False).delete()
+
+
+def pending():
+    """Число помеченных, но ещё не очищенных рецептов и пользователей."""
+    return (
+        Recipe.objects.filter(deleted_at__isnull=False).count(),
+        User.objects.filter(deleted_at__isnull=False).count(),
+    )
+
+
+def purge(progress=None):
+    """
+    Очищает помеченные рецепты пользователей, которые не удаляются,
+    затем помеченных пользователей вместе с их рецептами.
+    progress(вид, обработано, всего) вызывается через каждые
+    PROGRESS_EVERY объектов и после последнего.
+
+    Объекты, которые в это время очищает другой процесс, пропускаются.
+    Возвращает {вид: (очищено, пропущено)}.
+    """
+    result = {}
+    for kind, queryset, purge_one in (
+        ('recipes', Recipe.objects.filter(author__deleted_at__isnull=True),
+         purge_recipe),
+        ('users', User.objects.all(), purge_user),
+    ):
+        ids = list(queryset.filter(
+            deleted_at__isnull=False
+        ).order_by('pk').values_list('pk', flat=True))
+        purged = 0
+        for done, pk in enumerate(ids, 1):
+            purged += purge_one(pk)
+            if progress and (done % PROGRESS_EVERY == 0
+                             or done == len(ids)):
+                progress(kind, done, len(ids))
+        result[kind] = (purged, len(ids) - purged)
+    return result
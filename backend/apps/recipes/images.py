@@ -0,0 +1,136 @@
+"""
+Обработка изображений: проверка загрузок и уменьшенные копии рецептов
+в WebP и JPEG.
+
+На потоке запроса изображение проверяется декодированием (JPEG —
+в уменьшенном масштабе), и повреждённый файл отклоняется с ответом
+400. Копии строятся в пуле потоков процесса после фиксации
+транзакции, чтобы не задерживать ответ на запрос.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from apps.recipes.models import Recipe
+from config.constants import IMAGE_FORMATS, IMAGE_VARIANTS
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'recipes/variants'
+# Ошибки Pillow при разборе и декодировании повреждённого файла
+IMAGE_ERRORS = (OSError, SyntaxError, ValueError,
+                Image.DecompressionBombError)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Пул потоков для обработки изображений, создаётся при первом вызове."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_WORKERS,
+                thread_name_prefix='recipe-images',
+            )
+    return _executor
+
+
+def _resize(image, width, height, crop):
+    if crop:
+        return ImageOps.fit(image, (width, height), Image.LANCZOS)
+    resized = image.copy()
+    resized.thumbnail((width, height), Image.LANCZOS)
+    return resized
+
+
+def render_variants(name):
+    """
+    Сохраняет варианты изображения name и возвращает их имена:
+    {вариант: {расширение: имя файла}}.
+
+    Метаданные (EXIF и пр.) не переносятся, ориентация из EXIF
+    применяется к пикселям.
+    """
+    with default_storage.open(name) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image = image.convert('RGB')
+    variants = {}
+    for variant, (width, height, crop) in IMAGE_VARIANTS.items():
+        resized = _resize(image, width, height, crop)
+        variants[variant] = {}
+        for image_format, extension, options in IMAGE_FORMATS:
+            buffer = BytesIO()
+            resized.save(buffer, format=image_format, **options)
+            variants[variant][extension] = default_storage.save(
+                f'{VARIANTS_DIR}/{variant}.{extension}',
+                ContentFile(buffer.getvalue())
+            )
+    return variants
+
+
+def identify(file):
+    """
+    Проверяет, что файл — целое изображение; ошибки — IMAGE_ERRORS.
+
+    Файл декодируется полностью: заголовка и Image.verify()
+    недостаточно, обрезанный JPEG или GIF они пропускают. JPEG
+    декодируется в масштабе 1/8, что в несколько раз быстрее.
+    """
+    image = Image.open(file)
+    image.draft(image.mode, (image.width // 8, image.height // 8))
+    image.load()
+    file.seek(0)
+
+
+def process_recipe_image(recipe_id):
+    """
+    Строит варианты текущего изображения рецепта.
+
+    Если изображение успели заменить, результат отбрасывается.
+    Файлы прежних вариантов не удаляются: при хранении по содержимому
+    они могут принадлежать другим рецептам. Если изображение всё же
+    не удалось декодировать, ошибка пишется в журнал, а рецепт
+    сохраняет изображение без вариантов.
+    """
+    try:
+        name = Recipe.objects.filter(pk=recipe_id).values_list(
+            'image', flat=True
+        ).first()
+        if not name:
+            return
+        try:
+            variants = render_variants(name)
+        except IMAGE_ERRORS:
+            # Варианты прежнего изображения больше не подходят: ссылки
+            # ведут на оригинал
+            logger.warning('Повреждённое изображение рецепта %s: %s',
+                           recipe_id, name)
+            variants = {}
+        Recipe.objects.filter(pk=recipe_id, image=name).update(
+            image_variants=variants,
+            updated_at=timezone.now(),
+        )
+    except Exception:
+        logger.exception('Не удалось обработать изображение рецепта %s',
+                         recipe_id)
+    finally:
+        close_old_connections()
+
+
+def _schedule(task, pk):
+    transaction.on_commit(lambda: get_executor().submit(task, pk))
+
+
+def schedule_variants(recipe_id):
+    """Ставит обработку изображения в пул после фиксации транзакции."""
+    _schedule(process_recipe_image, recipe_id)
@@ -0,0 +1,110 @@
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.recipes.models import Recipe
+
+# Читающие эндпоинты; {recipe} заменяется случайным id рецепта
+READ_PATHS = (
+    '/api/tags/',
+    '/api/ingredients/?name=%D0%B0',
+    '/api/recipes/?limit=6',
+    '/api/recipes/?limit=6&cursor=',
+    '/api/recipes/{recipe}/',
+    '/api/recipes/{recipe}/get-link/',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность и задержки читающих эндпоинтов '
+        'на нескольких запущенных серверах. Пример для одной локальной '
+        'базы PostgreSQL:\n'
+        '  gunicorn config.wsgi:application -w 4 -b 127.0.0.1:8001\n'
+        '  gunicorn config.asgi:application -w 4 '
+        '-k uvicorn.workers.UvicornWorker -b 127.0.0.1:8002\n'
+        '  python manage.py benchmark_reads '
+        'http://127.0.0.1:8001 http://127.0.0.1:8002'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+',
+                            help='Адреса серверов для сравнения')
+        parser.add_argument('--concurrency', type=int, default=32,
+                            help='Число одновременных клиентов')
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Число запросов на сервер')
+        parser.add_argument('--warmup', type=int, default=100,
+                            help='Запросы прогрева, не входящие в замер')
+        parser.add_argument('--token',
+                            help='Токен для заголовка Authorization')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Зерно выбора эндпоинтов и рецептов')
+
+    def handle(self, *args, **options):
+        recipes = list(
+            Recipe.objects.alive().values_list('pk', flat=True)[:100]
+        )
+        if not recipes:
+            raise CommandError('В базе нет рецептов для замера')
+        rng = random.Random(options['seed'])
+        paths = [
+            rng.choice(READ_PATHS).format(recipe=rng.choice(recipes))
+            for _ in range(options['requests'])
+        ]
+        headers = {'Accept': 'application/json'}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+
+        self.stdout.write(
+            f'{"сервер":<28}{"запр/с":>9}{"p50, мс":>9}{"p95, мс":>9}'
+            f'{"p99, мс":>9}{"max, мс":>9}{"ошибки":>8}'
+        )
+        for url in options['urls']:
+            base = url.rstrip('/')
+            self.run(base, paths[:options['warmup']], headers,
+                     options['concurrency'])
+            started = time.perf_counter()
+            results = self.run(base, paths, headers, options['concurrency'])
+            elapsed = time.perf_counter() - started
+            latencies = sorted(ms for ms, ok in results if ok)
+            errors = len(results) - len(latencies)
+            if len(latencies) < 2:
+                # Квантили по одному замеру не посчитать: это как раз
+                # случай, о котором замер должен сообщить
+                self.stdout.write(self.style.ERROR(
+                    f'{base:<28}{"—":>9}{"—":>9}{"—":>9}{"—":>9}{"—":>9}'
+                    f'{errors:>8}'
+                ))
+                continue
+            quantiles = statistics.quantiles(latencies, n=100)
+            self.stdout.write(
+                f'{base:<28}{len(results) / elapsed:>9.1f}'
+                f'{quantiles[49]:>9.1f}{quantiles[94]:>9.1f}'
+                f'{quantiles[98]:>9.1f}{latencies[-1]:>9.1f}{errors:>8}'
+            )
+
+    @staticmethod
+    def fetch(url, headers):
+        """Время запроса в мс и признак успешного ответа."""
+        started = time.perf_counter()
+        try:
+            with urlopen(Request(url, headers=headers), timeout=30) as resp:
+                resp.read()
+                ok = resp.status < 400
+        except HTTPError as error:
+            ok = error.code == 304
+        except (URLError, OSError):
+            ok = False
+        return (time.perf_counter() - started) * 1000, ok
+
+    def run(self, base, paths, headers, concurrency):
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(
+                lambda path: self.fetch(base + path, headers), paths
+            ))
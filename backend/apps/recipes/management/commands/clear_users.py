@@ -1,13 +1,38 @@
-from django.core.management.base import BaseCommand
-
+from apps.recipes import deletion
+from apps.recipes.management.commands import purge_deleted
 from apps.users.models import User
+from config.constants import DELETION_CHUNK_SIZE
+
 
+class Command(purge_deleted.Command):
+    help = (
+        'Удаляет всех пользователей кроме суперпользователей. '
+        'Пользователи сразу помечаются удалёнными и исчезают из API, '
+        'затем их рецепты и связи удаляются пачками. Прерванную команду '
+        'можно запустить снова: она продолжит с места остановки'
+    )
 
-class Command(BaseCommand):
-    help = 'Удаляет всех пользователей кроме суперпользователей'
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DELETION_CHUNK_SIZE,
+            help='Пользователей, помечаемых за одну транзакцию',
+        )
 
     def handle(self, *args, **options):
-        count, _ = User.objects.exclude(is_superuser=True).delete()
+        users = User.objects.exclude(is_superuser=True)
+        marked = 0
+        while True:
+            batch = users.filter(deleted_at__isnull=True).order_by(
+                'pk'
+            ).values_list('pk', flat=True)[:options['batch_size']]
+            count = deletion.mark_users(User.objects.filter(pk__in=batch))
+            if not count:
+                break
+            marked += count
+            self.stdout.write(f'Помечено пользователей: {marked}')
+
+        recipes, pending = deletion.pending()
         self.stdout.write(
-            self.style.SUCCESS(f'Удалено {count} пользователей')
+            f'Ожидают очистки: пользователей {pending}, рецептов {recipes}'
         )
+        self.purge()
@@ -0,0 +1,393 @@
+import csv
+import heapq
+import io
+import json
+import random
+import time
+from bisect import bisect
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.db.models.fields.files import FieldFile
+from django.utils import timezone
+from PIL import Image
+
+from apps.api.search import update_search_vector
+from apps.recipes import shopping_list
+from apps.recipes.models import (
+    Favorite,
+    FeedItem,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Tag,
+)
+from apps.users.models import Subscribe, User
+from config.constants import FEED_BACKFILL_SIZE, FEED_CELEBRITY_SUBSCRIBERS
+
+PASSWORD = 'synthetic-password'
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Сергей', 'Елена',
+               'Дмитрий', 'Наталья', 'Алексей', 'Ирина', 'Михаил')
+LAST_NAMES = ('Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов',
+              'Лебедев', 'Козлов', 'Новиков', 'Морозов', 'Волков')
+ADJECTIVES = ('Домашний', 'Быстрый', 'Пряный', 'Летний', 'Зимний',
+              'Бабушкин', 'Постный', 'Праздничный', 'Острый', 'Сливочный')
+DISHES = ('суп', 'салат', 'пирог', 'плов', 'омлет', 'гуляш', 'рагу',
+          'соус', 'десерт', 'хлеб', 'борщ', 'рулет')
+COOKING_TIMES = (5, 10, 15, 20, 30, 40, 45, 60, 90, 120, 180)
+COPY_NULL = r'\N'
+
+
+class Zipf:
+    """
+    Случайный ранг от 0 до n - 1 с вероятностью,
+    пропорциональной 1 / (ранг + 1) ** exponent.
+    """
+
+    def __init__(self, n, exponent, rng):
+        self.weights = list(accumulate(
+            (rank + 1) ** -exponent for rank in range(n)
+        ))
+        self.rng = rng
+
+    def __call__(self):
+        return bisect(self.weights, self.rng.random() * self.weights[-1])
+
+    def distinct(self, count, exclude=None):
+        """Отсортированные различные ранги, кроме exclude."""
+        count = min(count, len(self.weights) - (exclude is not None))
+        chosen = set()
+        while len(chosen) < count:
+            rank = self()
+            if rank != exclude:
+                chosen.add(rank)
+        return sorted(chosen)
+
+
+def _copy_value(value):
+    """Значение поля в виде ячейки CSV для COPY."""
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, FieldFile):
+        return value.name or ''
+    return value
+
+
+@contextmanager
+def explicit_dates(model):
+    """
+    Отключает auto_now и auto_now_add полей модели: bulk_create
+    иначе заменяет заданные даты текущим временем.
+    """
+    fields = [field for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False)
+              or getattr(field, 'auto_now_add', False)]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт воспроизводимый синтетический набор данных для замеров: '
+        'пользователей, рецепты, избранное, корзины и подписки с '
+        'популярностью по закону Ципфа; даты регистрации и публикации '
+        'распределены по последним --days дням. Пишет пачками (COPY в '
+        'PostgreSQL, bulk_create в остальных базах), затем пересчитывает '
+        'счётчики, списки покупок, ленты и поисковые векторы. Нужны '
+        'загруженные теги и ингредиенты (load_data). Пример:\n'
+        '  python manage.py generate_data --users 100000 '
+        '--recipes 1000000'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000,
+                            help='Число пользователей')
+        parser.add_argument('--recipes', type=int, default=10000,
+                            help='Число рецептов')
+        parser.add_argument('--favorites-per-user', type=int, default=20,
+                            help='Рецептов в избранном у пользователя')
+        parser.add_argument('--cart-per-user', type=int, default=3,
+                            help='Рецептов в корзине у пользователя')
+        parser.add_argument('--subscriptions-per-user', type=int,
+                            default=5, help='Подписок у пользователя')
+        parser.add_argument(
+            '--days', type=int, default=730,
+            help='За сколько последних дней регистрируются пользователи '
+                 'и публикуются рецепты',
+        )
+        parser.add_argument('--zipf', type=float, default=1.1,
+                            help='Показатель распределения популярности')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Зерно генератора')
+        parser.add_argument('--prefix', default='synthetic',
+                            help='Префикс имён и почты пользователей')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Строк в одной пачке записи')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.now = timezone.now()
+        self.window = timedelta(days=options['days']).total_seconds()
+        self.tags = list(Tag.objects.order_by('pk').values_list(
+            'pk', flat=True
+        ))
+        self.ingredients = list(Ingredient.objects.order_by('pk').values_list(
+            'pk', flat=True
+        ))
+        if not self.tags or not self.ingredients:
+            raise CommandError(
+                'Сначала загрузите теги и ингредиенты: '
+                'python manage.py load_data'
+            )
+        if options['days'] < 1:
+            raise CommandError('--days должен быть положительным')
+        if options['users'] < 2 or options['recipes'] < 1:
+            raise CommandError('Нужны хотя бы 2 пользователя и 1 рецепт')
+        if User.objects.filter(
+            username__startswith=options['prefix']
+        ).exists():
+            raise CommandError(
+                f'Пользователи с префиксом «{options["prefix"]}» уже '
+                'есть; укажите другой --prefix'
+            )
+        self.copy = connection.vendor == 'postgresql'
+
+        with transaction.atomic():
+            self.stage('Пользователи', self.create_users)
+            self.stage('Рецепты', self.create_recipes)
+            self.stage('Избранное и корзины', self.create_collections)
+            self.stage('Подписки', self.create_subscriptions)
+            self.stage('Ленты', self.create_feeds)
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [User, Recipe]
+                ):
+                    cursor.execute(sql)
+            self.stage('Поисковые векторы', lambda: update_search_vector(
+                Recipe.objects.filter(pk__gte=self.recipe_ids[0])
+            ))
+        self.stage('Счётчики', lambda: call_command(
+            'recount_counters', stdout=io.StringIO()
+        ))
+        self.stage('Списки покупок', shopping_list.rebuild)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {options["users"]}, '
+            f'рецептов: {options["recipes"]}'
+        ))
+
+    def stage(self, title, func):
+        started = time.perf_counter()
+        func()
+        self.stdout.write(
+            f'{title}: {time.perf_counter() - started:.1f} с'
+        )
+
+    def write(self, model, objs):
+        """Записывает пачку объектов без сигналов и проверок."""
+        if not objs:
+            return
+        if not self.copy:
+            with explicit_dates(model):
+                model.objects.bulk_create(
+                    objs, batch_size=self.options['batch_size']
+                )
+            return
+        fields = [field for field in model._meta.concrete_fields
+                  if not (field.primary_key and objs[0].pk is None)]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for obj in objs:
+            writer.writerow([_copy_value(getattr(obj, field.attname))
+                             for field in fields])
+        buffer.seek(0)
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {quote(model._meta.db_table)} '
+                f'({", ".join(quote(field.column) for field in fields)}) '
+                f"FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')",
+                buffer,
+            )
+
+    def batches(self, model, objs):
+        """Пишет объекты из генератора пачками по --batch-size."""
+        batch = []
+        for obj in objs:
+            batch.append(obj)
+            if len(batch) >= self.options['batch_size']:
+                self.write(model, batch)
+                batch = []
+        self.write(model, batch)
+
+    def moment(self, since=None):
+        """
+        Случайный момент между since (по умолчанию начало окна --days)
+        и текущим временем с точностью до микросекунды: даты не
+        совпадают, и курсорная пагинация работает как на живых данных.
+        """
+        start = (self.now - since).total_seconds() if since else self.window
+        return self.now - timedelta(seconds=self.rng.random() * start)
+
+    @staticmethod
+    def first_id(model):
+        return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+    def create_users(self):
+        first = self.first_id(User)
+        prefix = self.options['prefix']
+        password = make_password(PASSWORD)
+        self.user_ids = list(range(first, first + self.options['users']))
+        # Популярность авторов: ранг по Ципфу -> пользователь
+        self.popular_authors = self.user_ids[:]
+        self.rng.shuffle(self.popular_authors)
+        # Пользователи регистрируются по порядку id
+        self.joined = dict(zip(self.user_ids, sorted(
+            self.moment() for _ in self.user_ids
+        )))
+        self.batches(User, (
+            User(
+                id=user_id,
+                username=f'{prefix}{number}',
+                email=f'{prefix}{number}@example.com',
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES),
+                password=password,
+                date_joined=self.joined[user_id],
+            )
+            for number, user_id in enumerate(self.user_ids)
+        ))
+
+    def create_recipes(self):
+        first = self.first_id(Recipe)
+        self.recipe_ids = list(
+            range(first, first + self.options['recipes'])
+        )
+        image = self.placeholder_image()
+        authors = Zipf(len(self.user_ids), self.options['zipf'], self.rng)
+        ingredients = Zipf(
+            len(self.ingredients), self.options['zipf'], self.rng
+        )
+        # Последние рецепты авторов для заполнения лент: куча
+        # из FEED_BACKFILL_SIZE самых новых (pub_date, id)
+        self.latest = defaultdict(list)
+        recipes, links, tags = [], [], []
+        for recipe_id in self.recipe_ids:
+            author_id = self.popular_authors[authors()]
+            pub_date = self.moment(since=self.joined[author_id])
+            latest = self.latest[author_id]
+            if len(latest) < FEED_BACKFILL_SIZE:
+                heapq.heappush(latest, (pub_date, recipe_id))
+            else:
+                heapq.heappushpop(latest, (pub_date, recipe_id))
+            recipes.append(Recipe(
+                id=recipe_id,
+                author_id=author_id,
+                name=(f'{self.rng.choice(ADJECTIVES)} '
+                      f'{self.rng.choice(DISHES)} №{recipe_id}'),
+                text='Смешать ингредиенты и готовить до готовности.',
+                cooking_time=self.rng.choice(COOKING_TIMES),
+                image=image,
+                pub_date=pub_date,
+                updated_at=pub_date,
+            ))
+            links.extend(
+                RecipeIngredient(
+                    recipe_id=recipe_id,
+                    ingredient_id=self.ingredients[rank],
+                    amount=self.rng.randint(1, 500),
+                )
+                for rank in ingredients.distinct(self.rng.randint(3, 10))
+            )
+            tags.extend(
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for tag_id in sorted(self.rng.sample(
+                    self.tags, self.rng.randint(1, min(3, len(self.tags)))
+                ))
+            )
+            if len(recipes) >= self.options['batch_size']:
+                self.write_recipes(recipes, links, tags)
+                recipes, links, tags = [], [], []
+        self.write_recipes(recipes, links, tags)
+
+    def write_recipes(self, recipes, links, tags):
+        self.write(Recipe, recipes)
+        self.write(RecipeIngredient, links)
+        self.write(Recipe.tags.through, tags)
+
+    def placeholder_image(self):
+        """Одно общее изображение рецептов (хранилище дедуплицирует)."""
+        buffer = io.BytesIO()
+        Image.new('RGB', (640, 480), (222, 184, 135)).save(
+            buffer, 'JPEG', quality=80
+        )
+        return default_storage.save(
+            'recipes/synthetic.jpg', ContentFile(buffer.getvalue())
+        )
+
+    def create_collections(self):
+        # Популярность рецептов: ранг по Ципфу -> рецепт
+        popular = self.recipe_ids[:]
+        self.rng.shuffle(popular)
+        recipes = Zipf(len(popular), self.options['zipf'], self.rng)
+        for model, option in ((Favorite, 'favorites_per_user'),
+                              (ShoppingCart, 'cart_per_user')):
+            self.batches(model, (
+                model(user_id=user_id, recipe_id=popular[rank])
+                for user_id in self.user_ids
+                for rank in recipes.distinct(self.options[option])
+            ))
+
+    def create_subscriptions(self):
+        authors = Zipf(len(self.user_ids), self.options['zipf'], self.rng)
+        rank_of = {
+            author_id: rank
+            for rank, author_id in enumerate(self.popular_authors)
+        }
+        self.subscriptions = [
+            (user_id, self.popular_authors[rank])
+            for user_id in self.user_ids
+            for rank in authors.distinct(
+                self.options['subscriptions_per_user'],
+                exclude=rank_of[user_id],
+            )
+        ]
+        self.batches(Subscribe, (
+            Subscribe(user_id=user_id, author_id=author_id)
+            for user_id, author_id in self.subscriptions
+        ))
+
+    def create_feeds(self):
+        """Ленты как после подписки (timelines.backfill) без сигналов."""
+        subscribers = Counter(
+            author_id for _, author_id in self.subscriptions
+        )
+        self.batches(FeedItem, (
+            FeedItem(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+            for user_id, author_id in self.subscriptions
+            if subscribers[author_id] < FEED_CELEBRITY_SUBSCRIBERS
+            for pub_date, recipe_id in self.latest.get(author_id, ())
+        ))
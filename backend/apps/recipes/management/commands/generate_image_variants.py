@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from apps.recipes.images import get_executor, process_recipe_image
+from apps.recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Строит уменьшенные варианты изображений рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Перестроить варианты и для уже обработанных рецептов',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_variants={})
+        ids = list(recipes.values_list('pk', flat=True))
+        futures = [get_executor().submit(process_recipe_image, pk)
+                   for pk in ids]
+        for done, future in enumerate(futures, 1):
+            future.result()
+            if done % 100 == 0:
+                self.stdout.write(f'Обработано: {done} из {len(ids)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {len(ids)}'
+        ))
@@ -1,80 +1,153 @@
 import csv
+import io
 import json
 import os
+import time
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
 from apps.recipes.models import Ingredient, Tag
-from config import settings
-
-
-def ingredient_create(row):
-    Ingredient.objects.get_or_create(name=row[0], measurement_unit=row[1])
-
-
-def load_tags():
-    """Загрузка тегов из JSON файла"""
-    tags_path = os.path.join(settings.BASE_DIR, "data", "tags.json")
-
-    try:
-        with open(tags_path, "r", encoding="utf-8") as file:
-            tags_data = json.load(file)
-
-        created_count = 0
-        for tag_data in tags_data:
-            tag, created = Tag.objects.get_or_create(
-                name=tag_data['name'],
-                slug=tag_data['slug']
-            )
-            if created:
-                created_count += 1
-        return created_count
-
-    except FileNotFoundError:
-        return -1  # Код ошибки для файла не найден
-    except Exception:
-        return -2  # Код ошибки для других ошибок
+from apps.recipes.versions import bump_version
+from config.constants import (
+    INGREDIENTS_FILE_PATH,
+    MAX_LENGHT_MEAS_INGR,
+    MAX_LENGHT_NAME_INGR,
+    MAX_LENGHT_NAME_TAG,
+    MAX_LENGHT_SLUG,
+    TAGS_FILE_PATH,
+)
+
+BATCH_SIZE = 5000
+# Сколько новых строк показывать в отчёте --dry-run
+PREVIEW_SIZE = 10
+CSV_HEADER = ['name', 'measurement_unit']
+
+
+def read_ingredients(path):
+    """
+    Пары (название, единица измерения) из CSV или JSON.
+
+    CSV читается построчно; строка заголовка name,measurement_unit
+    пропускается, если она есть.
+    """
+    with open(path, encoding='utf-8') as file:
+        if path.endswith('.json'):
+            for item in json.load(file):
+                yield item.get('name'), item.get('measurement_unit')
+            return
+        for row in csv.reader(file):
+            if row == CSV_HEADER:
+                continue
+            yield tuple(row) if len(row) == 2 else (None, None)
+
+
+def read_tags(path):
+    with open(path, encoding='utf-8') as file:
+        for item in json.load(file):
+            yield item.get('name'), item.get('slug')
+
+
+def diff(rows, existing, limits, key):
+    """
+    Новые строки в порядке файла и статистика сравнения.
+
+    existing — множество ключей строк, уже записанных в базу.
+    """
+    stats = {'rows': 0, 'existing': 0, 'duplicates': 0, 'invalid': 0}
+    new = {}
+    for row in rows:
+        stats['rows'] += 1
+        row = tuple((value or '').strip() for value in row)
+        if not all(row) or any(
+            len(value) > limit for value, limit in zip(row, limits)
+        ):
+            stats['invalid'] += 1
+        elif key(row) in existing:
+            stats['existing'] += 1
+        elif key(row) in new:
+            stats['duplicates'] += 1
+        else:
+            new[key(row)] = row
+    return list(new.values()), stats
+
+
+def copy_ingredients(rows):
+    """
+    COPY новых ингредиентов во временную таблицу и вставка с
+    ON CONFLICT DO NOTHING (на случай параллельной записи).
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    table = connection.ops.quote_name(Ingredient._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMP TABLE ingredient_import '
+            '(name text, measurement_unit text) ON COMMIT DROP'
+        )
+        cursor.copy_expert(
+            'COPY ingredient_import FROM STDIN WITH (FORMAT csv)', buffer
+        )
+        cursor.execute(
+            f'INSERT INTO {table} (name, measurement_unit) '
+            'SELECT name, measurement_unit FROM ingredient_import '
+            'ON CONFLICT DO NOTHING'
+        )
+        return cursor.rowcount
 
 
 class Command(BaseCommand):
-    help = "Load ingredients and tags to DB"
+    help = (
+        'Загружает ингредиенты (CSV или JSON) и теги (JSON). Сравнивает '
+        'файл с базой одним запросом и добавляет только новые строки '
+        'пачками: COPY в PostgreSQL, bulk_create в остальных базах'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ingredients', default=INGREDIENTS_FILE_PATH,
+            help='Файл ингредиентов: .csv (название,единица) или .json'
+        )
+        parser.add_argument('--tags', default=TAGS_FILE_PATH,
+                            help='Файл тегов в формате JSON')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Показать расхождения с базой, ничего не записывая'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Строк в одной пачке bulk_create')
 
     def handle(self, *args, **options):
-        ingredients_path = os.path.join(settings.BASE_DIR,
-                                        "data",
-                                        "ingredients.csv")
-
+        self.options = options
         self.stdout.write("📦 Загрузка ингредиентов...")
-
-        try:
-            with open(ingredients_path, "r", encoding="utf-8") as file:
-                reader = csv.reader(file)
-                next(reader)
-
-                count = 0
-                for row in reader:
-                    ingredient_create(row)
-                    count += 1
-
-                self.stdout.write(
-                    self.style.SUCCESS(f"✅ Загружено {count} ингредиентов")
-                )
-
-        except FileNotFoundError:
-            self.stderr.write("❌ Файл ingredients.csv не найден")
-            return
+        if not os.path.exists(options['ingredients']):
+            raise CommandError(
+                f"❌ Файл {options['ingredients']} не найден"
+            )
+        self.load(
+            Ingredient, ('name', 'measurement_unit'),
+            read_ingredients(options['ingredients']),
+            existing=set(Ingredient.objects.values_list(
+                'name', 'measurement_unit'
+            )),
+            limits=(MAX_LENGHT_NAME_INGR, MAX_LENGHT_MEAS_INGR),
+            label='ингредиентов',
+            version='ingredients',
+        )
 
         self.stdout.write("🏷️ Загрузка тегов...")
-        tags_count = load_tags()
-
-        if tags_count == -1:
-            self.stderr.write("⚠️ Файл tags.json не найден")
-        elif tags_count == -2:
-            self.stderr.write("❌ Ошибка при загрузке тегов")
-        else:
-            self.stdout.write(
-                self.style.SUCCESS(f"✅ Загружено {tags_count} тегов")
+        if os.path.exists(options['tags']):
+            self.load(
+                Tag, ('name', 'slug'), read_tags(options['tags']),
+                existing=set(Tag.objects.values_list('slug', flat=True)),
+                limits=(MAX_LENGHT_NAME_TAG, MAX_LENGHT_SLUG),
+                label='тегов',
+                version='tags',
+                key=lambda row: row[1],
             )
+        else:
+            self.stderr.write(f"⚠️ Файл {options['tags']} не найден")
 
         self.stdout.write(
             self.style.SUCCESS(
@@ -82,3 +155,47 @@ class Command(BaseCommand):
                 f"{Tag.objects.count()} тегов"
             )
         )
+
+    def load(self, model, fields, rows, existing, limits, label, version,
+             key=tuple):
+        """
+        Сравнивает строки файла с базой и добавляет новые.
+
+        key — ключ строки для сравнения (по умолчанию строка целиком).
+        """
+        started = time.perf_counter()
+        new, stats = diff(rows, existing, limits, key)
+        compared = time.perf_counter()
+        self.stdout.write(
+            f"   в файле: {stats['rows']}, уже в базе: "
+            f"{stats['existing']}, новых: {len(new)}, повторов в файле: "
+            f"{stats['duplicates']}, некорректных: {stats['invalid']} "
+            f"({compared - started:.2f} с)"
+        )
+        if self.options['dry_run']:
+            for row in new[:PREVIEW_SIZE]:
+                self.stdout.write(f"   + {', '.join(row)}")
+            if len(new) > PREVIEW_SIZE:
+                self.stdout.write(f"   … и ещё {len(new) - PREVIEW_SIZE}")
+            return
+        if not new:
+            return
+        with transaction.atomic():
+            if model is Ingredient and connection.vendor == 'postgresql':
+                created = copy_ingredients(new)
+            else:
+                # С ignore_conflicts bulk_create не сообщает, какие строки
+                # вставлены: число берётся по разнице COUNT(*)
+                before = model.objects.count()
+                model.objects.bulk_create(
+                    (model(**dict(zip(fields, row))) for row in new),
+                    batch_size=self.options['batch_size'],
+                    ignore_conflicts=True,
+                )
+                created = model.objects.count() - before
+            # bulk_create и COPY не вызывают сигналов модели
+            transaction.on_commit(lambda: bump_version(version))
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Загружено {created} {label} "
+            f"({time.perf_counter() - compared:.2f} с)"
+        ))
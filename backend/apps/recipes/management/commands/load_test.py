@@ -0,0 +1,381 @@
+import json
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Изображение 1x1 PNG для создаваемых рецептов
+PNG_PIXEL = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+PASSWORD = 'LoadTest-Pass-9731'
+# Сценарии и их доли в смеси по умолчанию
+JOURNEYS = {
+    'browse': 30,
+    'open_recipe': 25,
+    'favorite': 10,
+    'shopping_cart': 10,
+    'subscribe': 10,
+    'feed': 10,
+    'author': 5,
+}
+COLUMNS = ('requests', 'rps', 'p50', 'p95', 'p99', 'max', 'errors')
+
+
+class Client:
+    """HTTP-клиент виртуального пользователя, записывающий замеры."""
+
+    def __init__(self, base, record):
+        self.base = base
+        self.record = record
+        self.token = None
+
+    def request(self, method, path, endpoint, data=None, expect=None):
+        """
+        Ответ в виде (статус, JSON или None). endpoint — имя строки
+        отчёта: путь с шаблонами вместо идентификаторов.
+        """
+        headers = {'Accept': 'application/json'}
+        body = None
+        if data is not None:
+            body = json.dumps(data).encode()
+            headers['Content-Type'] = 'application/json'
+        if self.token:
+            headers['Authorization'] = f'Token {self.token}'
+        started = time.perf_counter()
+        try:
+            with urlopen(Request(self.base + path, body, headers,
+                                 method=method), timeout=60) as resp:
+                status, payload = resp.status, resp.read()
+        except HTTPError as error:
+            status, payload = error.code, error.read()
+        except (URLError, OSError):
+            status, payload = 0, b''
+        elapsed = (time.perf_counter() - started) * 1000
+        ok = status in expect if expect else 0 < status < 400
+        self.record(f'{method} {endpoint}', elapsed, ok)
+        try:
+            return status, json.loads(payload)
+        except ValueError:
+            return status, None
+
+    def get(self, path, endpoint=None, **kwargs):
+        return self.request('GET', path, endpoint or path, **kwargs)
+
+
+class VirtualUser:
+    """Пользователь, выполняющий случайные сценарии из общей смеси."""
+
+    def __init__(self, number, client, catalog, rng):
+        self.number = number
+        self.client = client
+        self.catalog = catalog
+        self.rng = rng
+        self.id = None
+
+    def login(self):
+        email = f'loadtest{self.number}@example.com'
+        self.client.request('POST', '/api/users/', '/api/users/', {
+            'email': email,
+            'username': f'loadtest{self.number}',
+            'first_name': 'Нагрузочный',
+            'last_name': f'Тест {self.number}',
+            'password': PASSWORD,
+        }, expect=(201, 400))
+        status, data = self.client.request(
+            'POST', '/api/auth/token/login/', '/api/auth/token/login/',
+            {'email': email, 'password': PASSWORD},
+        )
+        if status != 200:
+            raise CommandError(
+                f'Не удалось получить токен для {email}: {status}'
+            )
+        self.client.token = data['auth_token']
+        self.id = self.client.get('/api/users/me/')[1]['id']
+        self.reset()
+
+    def reset(self):
+        """Удаляет избранное, покупки и подписки прерванного запуска."""
+        for query, action in (('is_favorited=1', 'favorite'),
+                              ('is_in_shopping_cart=1', 'shopping_cart')):
+            _, page = self.client.get(f'/api/recipes/?{query}&limit=100')
+            for recipe in page['results'] if page else ():
+                self.client.request(
+                    'DELETE', f'/api/recipes/{recipe["id"]}/{action}/', ''
+                )
+        _, page = self.client.get('/api/users/subscriptions/?limit=100')
+        for author in page['results'] if page else ():
+            self.client.request(
+                'DELETE', f'/api/users/{author["id"]}/subscribe/', ''
+            )
+
+    def recipe(self):
+        return self.rng.choice(self.catalog['recipes'])
+
+    def browse(self):
+        """Лента с фильтром по тегам и переход на следующую страницу."""
+        self.client.get('/api/tags/')
+        tags = self.rng.sample(
+            self.catalog['tags'], min(2, len(self.catalog['tags']))
+        )
+        query = urlencode([('limit', 6)] + [('tags', tag) for tag in tags])
+        _, data = self.client.get(
+            f'/api/recipes/?{query}', '/api/recipes/?tags=…'
+        )
+        if data and data.get('next'):
+            self.client.get('/api/' + data['next'].split('/api/', 1)[1],
+                            '/api/recipes/?page=…')
+
+    def open_recipe(self):
+        recipe = self.recipe()
+        self.client.get(f'/api/recipes/{recipe}/', '/api/recipes/{id}/')
+        self.client.get(f'/api/recipes/{recipe}/get-link/',
+                        '/api/recipes/{id}/get-link/')
+
+    def favorite(self):
+        recipe = self.recipe()
+        self.client.request('POST', f'/api/recipes/{recipe}/favorite/',
+                            '/api/recipes/{id}/favorite/', expect=(201,))
+        self.client.get('/api/recipes/?is_favorited=1&limit=6',
+                        '/api/recipes/?is_favorited=1')
+        self.client.request('DELETE', f'/api/recipes/{recipe}/favorite/',
+                            '/api/recipes/{id}/favorite/', expect=(204,))
+
+    def shopping_cart(self):
+        recipes = self.rng.sample(
+            self.catalog['recipes'], min(3, len(self.catalog['recipes']))
+        )
+        for recipe in recipes:
+            self.client.request(
+                'POST', f'/api/recipes/{recipe}/shopping_cart/',
+                '/api/recipes/{id}/shopping_cart/', expect=(201,)
+            )
+        self.client.request(
+            'GET', '/api/recipes/download_shopping_cart/',
+            '/api/recipes/download_shopping_cart/', expect=(200,)
+        )
+        for recipe in recipes:
+            self.client.request(
+                'DELETE', f'/api/recipes/{recipe}/shopping_cart/',
+                '/api/recipes/{id}/shopping_cart/', expect=(204,)
+            )
+
+    def subscribe(self):
+        authors = [author for author in self.catalog['authors']
+                   if author != self.id]
+        if not authors:
+            return
+        author = self.rng.choice(authors)
+        self.client.request(
+            'POST', f'/api/users/{author}/subscribe/?recipes_limit=3',
+            '/api/users/{id}/subscribe/', expect=(201,)
+        )
+        self.client.get('/api/users/subscriptions/?recipes_limit=3')
+        self.client.request('DELETE', f'/api/users/{author}/subscribe/',
+                            '/api/users/{id}/subscribe/', expect=(204,))
+
+    def feed(self):
+        self.client.get('/api/recipes/feed/?limit=6')
+
+    def author(self):
+        """Создание, правка и удаление собственного рецепта."""
+        ingredients = self.rng.sample(
+            self.catalog['ingredients'],
+            min(3, len(self.catalog['ingredients']))
+        )
+        status, data = self.client.request(
+            'POST', '/api/recipes/', '/api/recipes/', {
+                'name': f'Нагрузочный рецепт {self.rng.random():.6f}',
+                'text': 'Рецепт, созданный нагрузочным тестом.',
+                'cooking_time': self.rng.randint(5, 120),
+                'image': PNG_PIXEL,
+                'tags': [self.rng.choice(self.catalog['tag_ids'])],
+                'ingredients': [
+                    {'id': ingredient, 'amount': self.rng.randint(1, 500)}
+                    for ingredient in ingredients
+                ],
+            }, expect=(201,)
+        )
+        if status != 201:
+            return
+        recipe = data['id']
+        self.client.request('PATCH', f'/api/recipes/{recipe}/',
+                            '/api/recipes/{id}/', {
+                                'cooking_time': self.rng.randint(5, 120),
+                                'tags': self.catalog['tag_ids'][:1],
+                                'ingredients': [{
+                                    'id': ingredients[0], 'amount': 100,
+                                }],
+                            }, expect=(200,))
+        self.client.request('DELETE', f'/api/recipes/{recipe}/',
+                            '/api/recipes/{id}/', expect=(204,))
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест по сценариям коллекции Postman: виртуальные '
+        'пользователи просматривают ленту с тегами, открывают рецепты, '
+        'добавляют их в избранное и список покупок, подписываются на '
+        'авторов и публикуют рецепты. Выводит число запросов в секунду и '
+        'задержки p50/p95/p99 по эндпоинтам; отчёт в JSON (--output) '
+        'можно сравнить с отчётом другого коммита (--compare). Пример:\n'
+        '  python manage.py load_test http://127.0.0.1:8000 --users 16 '
+        '--output after.json --compare before.json'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Адрес сервера')
+        parser.add_argument('--users', type=int, default=8,
+                            help='Число одновременных пользователей')
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='Число сценариев на пользователя')
+        parser.add_argument(
+            '--journeys', default=','.join(JOURNEYS),
+            help='Сценарии через запятую; доступны: '
+                 + ', '.join(JOURNEYS)
+        )
+        parser.add_argument('--think-time', type=float, default=0,
+                            help='Пауза между сценариями, с')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Зерно выбора сценариев и объектов')
+        parser.add_argument('--output',
+                            help='Файл для отчёта в формате JSON')
+        parser.add_argument('--compare',
+                            help='Отчёт JSON для сравнения')
+
+    def handle(self, *args, **options):
+        journeys = [name.strip() for name in options['journeys'].split(',')]
+        unknown = set(journeys) - set(JOURNEYS)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные сценарии: {", ".join(sorted(unknown))}'
+            )
+        base = options['url'].rstrip('/')
+        samples = defaultdict(list)
+        lock = threading.Lock()
+
+        def record(endpoint, elapsed, ok):
+            with lock:
+                samples[endpoint].append((elapsed, ok))
+
+        catalog = self.catalog(base)
+        users = []
+        for number in range(options['users']):
+            user = VirtualUser(
+                number, Client(base, lambda *sample: None), catalog,
+                random.Random(f'{options["seed"]}-{number}')
+            )
+            user.login()
+            user.client.record = record
+            users.append(user)
+
+        def run(user):
+            weights = [JOURNEYS[name] for name in journeys]
+            for _ in range(options['iterations']):
+                getattr(user, user.rng.choices(journeys, weights)[0])()
+                if options['think_time']:
+                    time.sleep(options['think_time'])
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=run, args=(user,))
+                   for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        report = {
+            'url': base,
+            'users': options['users'],
+            'iterations': options['iterations'],
+            'journeys': journeys,
+            'seed': options['seed'],
+            'duration': round(elapsed, 3),
+            'endpoints': {
+                endpoint: self.summary(values, elapsed)
+                for endpoint, values in sorted(samples.items())
+            },
+        }
+        report['total'] = self.summary(
+            [value for values in samples.values() for value in values],
+            elapsed,
+        )
+        previous = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                previous = json.load(file)
+        self.print_report(report, previous)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+    def catalog(self, base):
+        """Теги, ингредиенты, рецепты и их авторы для сценариев."""
+        client = Client(base, lambda *sample: None)
+        _, tags = client.get('/api/tags/')
+        _, ingredients = client.get('/api/ingredients/')
+        _, page = client.get('/api/recipes/?limit=100')
+        if not tags or not ingredients or not page or not page['results']:
+            raise CommandError(
+                'Для теста нужны теги, ингредиенты и хотя бы один рецепт'
+            )
+        return {
+            'tags': [tag['slug'] for tag in tags],
+            'tag_ids': [tag['id'] for tag in tags],
+            'ingredients': [
+                ingredient['id'] for ingredient in ingredients[:100]
+            ],
+            'recipes': [recipe['id'] for recipe in page['results']],
+            'authors': sorted({
+                recipe['author']['id'] for recipe in page['results']
+            }),
+        }
+
+    @staticmethod
+    def summary(values, elapsed):
+        latencies = sorted(ms for ms, _ in values)
+        if len(latencies) > 1:
+            quantiles = statistics.quantiles(
+                latencies, n=100, method='inclusive'
+            )
+        else:
+            quantiles = latencies * 99
+        return {
+            'requests': len(values),
+            'rps': round(len(values) / elapsed, 1),
+            'p50': round(quantiles[49], 1),
+            'p95': round(quantiles[94], 1),
+            'p99': round(quantiles[98], 1),
+            'max': round(latencies[-1], 1),
+            'errors': sum(not ok for _, ok in values),
+        }
+
+    def print_report(self, report, previous):
+        rows = dict(report['endpoints'], **{'Итого': report['total']})
+        old_rows = {}
+        if previous:
+            old_rows = dict(previous['endpoints'],
+                            **{'Итого': previous['total']})
+        width = max(map(len, rows)) + 2
+        self.stdout.write(
+            f'{"эндпоинт":<{width}}' + ''.join(
+                f'{column:>{12 if previous else 9}}' for column in COLUMNS
+            )
+        )
+        for endpoint, row in rows.items():
+            line = f'{endpoint:<{width}}'
+            for column in COLUMNS:
+                cell = f'{row[column]:g}'
+                old = old_rows.get(endpoint, {}).get(column)
+                if previous and old:
+                    cell += f' {(row[column] - old) / old:+.0%}'
+                line += f'{cell:>{12 if previous else 9}}'
+            self.stdout.write(line)
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from apps.recipes import deletion
+
+LABELS = {'recipes': 'рецептов', 'users': 'пользователей'}
+
+
+class Command(BaseCommand):
+    help = ('Удаляет рецепты и пользователей, помеченных на удаление, '
+            'если фоновая очистка не завершилась')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только показать, сколько объектов ждёт очистки',
+        )
+
+    def handle(self, *args, **options):
+        recipes, users = deletion.pending()
+        self.stdout.write(
+            f'Ожидают очистки: рецептов {recipes}, пользователей {users}'
+        )
+        if options['check'] or not (recipes or users):
+            return
+        self.purge()
+
+    def purge(self):
+        """Очищает помеченные объекты и сообщает, сколько пропущено."""
+        for kind, (purged, skipped) in deletion.purge(self.report).items():
+            self.stdout.write(
+                self.style.SUCCESS(f'Удалено {LABELS[kind]}: {purged}')
+            )
+            if skipped:
+                self.stdout.write(self.style.WARNING(
+                    f'Пропущено {LABELS[kind]}: {skipped} — их очищает '
+                    'другой процесс, запустите purge_deleted позже'
+                ))
+
+    def report(self, kind, done, total):
+        self.stdout.write(f'Обработано {LABELS[kind]}: {done} из {total}')
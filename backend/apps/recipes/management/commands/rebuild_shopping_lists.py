@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from apps.recipes import shopping_list
+
+
+class Command(BaseCommand):
+    help = ('Сверяет списки покупок с корзинами и пересобирает '
+            'расходящиеся')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить согласованность, ничего не меняя',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересобрать списки всех пользователей без сверки',
+        )
+
+    def handle(self, *args, **options):
+        if options['all']:
+            shopping_list.rebuild()
+            self.stdout.write(
+                self.style.SUCCESS('Списки покупок пересобраны')
+            )
+            return
+
+        drifted = shopping_list.find_drift()
+        self.stdout.write(f'Пользователей с расхождениями: {len(drifted)}')
+        if not drifted or options['check']:
+            return
+        shopping_list.rebuild(drifted)
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересобрано списков: {len(drifted)}')
+        )
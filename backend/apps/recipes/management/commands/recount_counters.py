@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from apps.recipes.counters import COUNTERS, actual_count
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только показать расхождения, ничего не меняя',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for target, field, source, fk in COUNTERS:
+            drifted = target.objects.annotate(
+                actual=actual_count(source, fk)
+            ).exclude(**{field: F('actual')})
+            label = f'{target.__name__}.{field}'
+            if options['check']:
+                count = drifted.count()
+            else:
+                with transaction.atomic():
+                    count = target.objects.filter(
+                        pk__in=drifted.values('pk')
+                    ).update(**{field: actual_count(source, fk)})
+            total += count
+            self.stdout.write(f'{label}: расхождений {count}')
+
+        message = (f'Найдено расхождений: {total}' if options['check']
+                   else f'Исправлено расхождений: {total}')
+        self.stdout.write(self.style.SUCCESS(message))
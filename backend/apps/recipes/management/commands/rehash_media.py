@@ -0,0 +1,168 @@
+import os
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.recipes.models import Recipe
+from apps.recipes.versions import USER_VERSION, bump_version
+from apps.users.models import User
+from config.storage import ContentAddressedStorage
+
+# Каталоги медиафайлов, которые обслуживает команда
+MEDIA_DIRS = ('recipes', 'users')
+# Файлы моложе этого не удаляются: загрузка может ещё не зафиксировать
+# транзакцию, а пул обработки изображений — дописывать варианты
+PRUNE_GRACE_MINUTES = 60
+
+
+class Command(BaseCommand):
+    help = ('Переименовывает медиафайлы по хешу содержимого '
+            'и удаляет файлы, на которые нет ссылок')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только показать, что будет изменено, ничего не меняя',
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help=('Удалить файлы, на которые не ссылается ни один объект; '
+                  'файлы моложе --grace минут не трогаются'),
+        )
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=PRUNE_GRACE_MINUTES,
+            help=('Сколько минут после записи файл не считается '
+                  'лишним: он может принадлежать незафиксированной '
+                  f'загрузке (по умолчанию {PRUNE_GRACE_MINUTES})'),
+        )
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, ContentAddressedStorage):
+            raise CommandError(
+                'Хранилище по умолчанию не ContentAddressedStorage'
+            )
+        self.check_only = options['check']
+        self.renamed = {}
+
+        recipes = self.rehash_recipes()
+        users = self.rehash_users()
+        self.stdout.write(f'Рецептов: {recipes}, пользователей: {users}')
+        if not self.check_only:
+            for name, new_name in self.renamed.items():
+                if new_name != name:
+                    default_storage.delete(name)
+
+        if self.check_only:
+            message = f'Нужно переименовать файлов: {len(self.renamed)}'
+        else:
+            message = f'Переименовано файлов: {len(self.renamed)}'
+        if options['prune']:
+            message += (
+                f', файлов без ссылок: '
+                f'{self.prune(timedelta(minutes=options["grace"]))}'
+            )
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def rehash(self, name):
+        """Имя файла по содержимому; без --check файл копируется под него."""
+        if not name or default_storage.is_hashed(name):
+            return name
+        if name not in self.renamed:
+            if not default_storage.exists(name):
+                self.stderr.write(f'Файл не найден: {name}')
+                return name
+            with default_storage.open(name) as file:
+                self.renamed[name] = (
+                    default_storage.hashed_name(name, file)
+                    if self.check_only
+                    else default_storage.save(name, file)
+                )
+        return self.renamed[name]
+
+    def rehash_recipes(self):
+        changed = 0
+        recipes = Recipe.objects.exclude(image='').values_list(
+            'pk', 'image', 'image_variants'
+        )
+        for pk, image, variants in recipes.iterator():
+            new_image = self.rehash(image)
+            new_variants = {
+                variant: {
+                    extension: self.rehash(name)
+                    for extension, name in formats.items()
+                }
+                for variant, formats in variants.items()
+            }
+            if (new_image, new_variants) == (image, variants):
+                continue
+            changed += 1
+            if not self.check_only:
+                Recipe.objects.filter(pk=pk, image=image).update(
+                    image=new_image,
+                    image_variants=new_variants,
+                    updated_at=timezone.now(),
+                )
+        return changed
+
+    def rehash_users(self):
+        changed = 0
+        users = User.objects.exclude(avatar='').values_list('pk', 'avatar')
+        for pk, avatar in users.iterator():
+            new_avatar = self.rehash(avatar)
+            if new_avatar == avatar:
+                continue
+            changed += 1
+            if not self.check_only:
+                User.objects.filter(pk=pk, avatar=avatar).update(
+                    avatar=new_avatar
+                )
+                bump_version(USER_VERSION.format(user_id=pk))
+        return changed
+
+    def referenced(self):
+        names = set(
+            User.objects.exclude(avatar='').values_list('avatar', flat=True)
+        )
+        recipes = Recipe.objects.exclude(image='').values_list(
+            'image', 'image_variants'
+        )
+        for image, variants in recipes.iterator():
+            names.add(image)
+            for formats in variants.values():
+                names.update(formats.values())
+        return names
+
+    def walk(self, directory):
+        if not default_storage.exists(directory):
+            return
+        directories, files = default_storage.listdir(directory)
+        for name in files:
+            yield os.path.join(directory, name)
+        for name in directories:
+            yield from self.walk(os.path.join(directory, name))
+
+    def prune(self, grace):
+        """
+        Удаляет файлы без ссылок, записанные раньше, чем grace назад.
+        Ссылки читаются после обхода файлов, чтобы файл, ссылка на
+        который появилась во время обхода, тоже считался занятым.
+        """
+        cutoff = timezone.now() - grace
+        candidates = [
+            name
+            for directory in MEDIA_DIRS
+            for name in self.walk(directory)
+            if default_storage.get_modified_time(name) < cutoff
+        ]
+        referenced = self.referenced()
+        orphans = [name for name in candidates if name not in referenced]
+        if not self.check_only:
+            for name in orphans:
+                default_storage.delete(name)
+        return len(orphans)
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.11 on 2026-10-17 04:03
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    User = apps.get_model('users', 'User')
+    Subscribe = apps.get_model('users', 'Subscribe')
+
+    def actual_count(source, fk):
+        return Coalesce(
+            Subquery(
+                source.objects.filter(**{fk: OuterRef('pk')})
+                .order_by()
+                .values(fk)
+                .annotate(total=Count('pk'))
+                .values('total')
+            ),
+            0
+        )
+
+    Recipe.objects.update(
+        favorites_count=actual_count(Favorite, 'recipe'),
+        cart_count=actual_count(ShoppingCart, 'recipe'),
+    )
+    User.objects.update(
+        recipes_count=actual_count(Recipe, 'author'),
+        subscribers_count=actual_count(Subscribe, 'author'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_alter_ingredient_measurement_unit_and_more'),
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='cart_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В корзинах'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,8 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 
-from apps.users.models import User
+from apps.users.models import Subscribe, User
 from config.constants import (
     MAX_AMOUNT,
     MAX_COOKING_TIME,
@@ -50,6 +51,44 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def alive(self):
+        """Рецепты, не помеченные на удаление (apps/recipes/deletion.py)."""
+        return self.filter(deleted_at__isnull=True)
+
+    def for_display(self, user):
+        """
+        Рецепты со всеми данными для RecipeSerializer: связи подгружаются
+        заранее, флаги пользователя считаются подзапросами EXISTS.
+        """
+        return self.select_related('author').defer(
+            'search_vector'
+        ).prefetch_related(
+            models.Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+            'tags',
+        ).with_user_flags(user)
+
+    def with_user_flags(self, user):
+        """
+        Аннотирует is_favorited, is_in_shopping_cart и
+        author_is_subscribed подзапросами EXISTS для пользователя.
+        """
+        if not user.is_authenticated:
+            return self
+        return self.annotate(
+            is_favorited=models.Exists(Favorite.objects.filter(
+                user=user, recipe=models.OuterRef('pk'))),
+            is_in_shopping_cart=models.Exists(ShoppingCart.objects.filter(
+                user=user, recipe=models.OuterRef('pk'))),
+            author_is_subscribed=models.Exists(Subscribe.objects.filter(
+                user=user, author=models.OuterRef('author'))),
+        )
+
+
 class Recipe(models.Model):
     name = models.CharField("Название", max_length=MAX_LENGHT_NAME_REC)
     text = models.TextField("Описание")
@@ -61,7 +100,11 @@ class Recipe(models.Model):
         ]
     )
     image = models.ImageField("Изображение", upload_to="recipes/", blank=True)
+    image_variants = models.JSONField(
+        "Варианты изображения", default=dict, blank=True, editable=False
+    )
     pub_date = models.DateTimeField("Дата публикации", auto_now_add=True)
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -75,11 +118,32 @@ class Recipe(models.Model):
         verbose_name="Ингредиенты",
     )
     tags = models.ManyToManyField(Tag, verbose_name="Теги")
+    favorites_count = models.PositiveIntegerField(
+        "В избранном", default=0, editable=False
+    )
+    cart_count = models.PositiveIntegerField(
+        "В корзинах", default=0, editable=False
+    )
+    deleted_at = models.DateTimeField(
+        "Удалён", null=True, blank=True, editable=False, db_index=True
+    )
+    search_vector = SearchVectorField(
+        "Поисковый вектор", null=True, editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ["-pub_date"]
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
+        indexes = [
+            # Последние рецепты автора: ленты и fan-out on read
+            models.Index(
+                fields=["author", "-pub_date", "-id"],
+                name="recipe_author_pub_date",
+            )
+        ]
 
     def __str__(self):
         return self.name
@@ -182,3 +246,91 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f"{self.user.username} - {self.recipe.name}"
+
+
+class ShoppingListItem(models.Model):
+    """Сумма ингредиента по всем рецептам в корзине пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь",
+        related_name="shopping_list_items",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name="Ингредиент",
+        related_name="shopping_list_items",
+    )
+    total_amount = models.PositiveIntegerField("Количество")
+
+    class Meta:
+        ordering = ["user", "ingredient"]
+        verbose_name = "Позиция списка покупок"
+        verbose_name_plural = "Списки покупок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient"],
+                name="unique_shopping_list_item"
+            )
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.user.username}: "
+            f"{self.ingredient.name} - {self.total_amount}"
+        )
+
+
+class FeedItem(models.Model):
+    """Рецепт в ленте подписок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="Читатель",
+        related_name="feed_items",
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name="Рецепт",
+        related_name="feed_items",
+    )
+    # Копия Recipe.pub_date: лента читается по индексу без сортировки
+    # рецептов
+    pub_date = models.DateTimeField("Дата публикации")
+
+    class Meta:
+        ordering = ["user", "recipe"]
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Ленты подписок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"], name="unique_feed_item"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-pub_date", "-recipe"],
+                name="feed_item_user_pub_date",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.recipe.name}"
+
+
+class DataVersion(models.Model):
+    """Метка версии набора данных для условных GET и кешей процессов."""
+
+    name = models.CharField("Набор данных", max_length=64, primary_key=True)
+    stamp = models.FloatField("Время изменения")
+
+    class Meta:
+        verbose_name = "Версия данных"
+        verbose_name_plural = "Версии данных"
+
+    def __str__(self):
+        return f"{self.name}: {self.stamp}"
@@ -0,0 +1,87 @@
+"""
+Пакетное добавление и удаление рецептов в избранном и корзине.
+
+Пакетные INSERT и DELETE не посылают сигналов моделей, поэтому
+счётчики, метки версий и список покупок обновляются здесь сразу
+для всей пачки.
+"""
+from django.db import connection, transaction
+
+from apps.recipes import shopping_list
+from apps.recipes.counters import counter_field, shift_counters
+from apps.recipes.models import Recipe, ShoppingCart
+from apps.recipes.versions import USER_VERSION, bump_version
+
+
+def _after_change(model, user, recipe_ids, sign):
+    """Побочные эффекты изменения пачки строк коллекции."""
+    if not recipe_ids:
+        return
+    shift_counters(Recipe, recipe_ids, counter_field(Recipe, model), sign)
+    if model is ShoppingCart:
+        shopping_list.add_recipes(user.pk, recipe_ids, sign)
+    transaction.on_commit(
+        lambda: bump_version(USER_VERSION.format(user_id=user.pk))
+    )
+
+
+def _columns(model):
+    quote = connection.ops.quote_name
+    return (
+        quote(model._meta.db_table),
+        quote(model._meta.get_field('user').column),
+        quote(model._meta.get_field('recipe').column),
+    )
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+@transaction.atomic
+def bulk_add(model, user, recipe_ids):
+    """
+    Добавляет рецепты в коллекцию одним INSERT ... ON CONFLICT DO NOTHING.
+
+    Добавленными считаются только строки, которые вернул RETURNING:
+    рецепт, одновременно добавленный другим запросом, учитывается
+    в счётчиках один раз. Возвращает пару (добавленные id, уже бывшие
+    в коллекции id).
+    """
+    if not recipe_ids:
+        return [], []
+    table, user_column, recipe_column = _columns(model)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({user_column}, {recipe_column}) '
+            f'VALUES {", ".join(["(%s, %s)"] * len(recipe_ids))} '
+            f'ON CONFLICT DO NOTHING RETURNING {recipe_column}',
+            [value for pk in recipe_ids for value in (user.pk, pk)],
+        )
+        inserted = {row[0] for row in cursor.fetchall()}
+    added = [pk for pk in recipe_ids if pk in inserted]
+    _after_change(model, user, added, 1)
+    return added, sorted(set(recipe_ids) - inserted)
+
+
+@transaction.atomic
+def bulk_remove(model, user, recipe_ids):
+    """
+    Удаляет рецепты из коллекции одним DELETE ... RETURNING и
+    возвращает id действительно удалённых строк.
+    """
+    if not recipe_ids:
+        return []
+    table, user_column, recipe_column = _columns(model)
+    # Один DELETE без сбора объектов и сигналов; их эффекты
+    # применяются ниже для всей пачки
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {user_column} = %s '
+            f'AND {recipe_column} IN ({_placeholders(recipe_ids)}) '
+            f'RETURNING {recipe_column}',
+            [user.pk, *recipe_ids],
+        )
+        removed = sorted(row[0] for row in cursor.fetchall())
+    _after_change(model, user, removed, -1)
+    return removed
@@ -0,0 +1,187 @@
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from apps.recipes.models import (
+    RecipeIngredient,
+    ShoppingCart,
+    ShoppingListItem,
+)
+
+BATCH_SIZE = 1000
+
+
+def recipe_amounts(recipe_id):
+    """Количества ингредиентов рецепта: {ingredient_id: amount}."""
+    return dict(
+        RecipeIngredient.objects.filter(recipe_id=recipe_id)
+        .order_by()
+        .values_list('ingredient_id', 'amount')
+    )
+
+
+def recipes_amounts(recipe_ids):
+    """Суммарные количества ингредиентов нескольких рецептов."""
+    return dict(
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+        .order_by()
+        .values('ingredient_id')
+        .annotate(total=Sum('amount'))
+        .values_list('ingredient_id', 'total')
+    )
+
+
+def amounts_diff(old, new):
+    """Разница двух наборов количеств: {ingredient_id: delta}."""
+    return {
+        ingredient_id: new.get(ingredient_id, 0) - old.get(ingredient_id, 0)
+        for ingredient_id in old.keys() | new.keys()
+    }
+
+
+def apply_deltas(user_ids, deltas):
+    """
+    Прибавляет deltas к спискам покупок пользователей.
+
+    Положительные дельты вставляются пачками с ON CONFLICT DO UPDATE,
+    прибавляющим количество к существующей позиции: одновременное
+    добавление одного ингредиента двумя корзинами не теряет ни одной
+    суммы. Отрицательные уменьшают позиции одним UPDATE
+    с F()-выражением, обнулившиеся позиции удаляются.
+    """
+    deltas = {key: value for key, value in deltas.items() if value}
+    user_ids = list(user_ids)
+    if not deltas or not user_ids:
+        return
+    added = {key: value for key, value in deltas.items() if value > 0}
+    removed = {key: value for key, value in deltas.items() if value < 0}
+    with transaction.atomic():
+        if added:
+            _add_amounts([
+                (user_id, key, value)
+                for user_id in user_ids for key, value in added.items()
+            ])
+        if removed:
+            items = ShoppingListItem.objects.filter(
+                user_id__in=user_ids, ingredient_id__in=removed
+            )
+            items.update(total_amount=Greatest(
+                F('total_amount') + Case(
+                    *(When(ingredient_id=key, then=Value(value))
+                      for key, value in removed.items()),
+                    output_field=IntegerField(),
+                ),
+                0
+            ))
+            items.filter(total_amount=0).delete()
+
+
+def _add_amounts(rows):
+    """Прибавляет строки (user_id, ingredient_id, amount) к позициям."""
+    quote = connection.ops.quote_name
+    table = quote(ShoppingListItem._meta.db_table)
+    user, ingredient, amount = (
+        quote(ShoppingListItem._meta.get_field(name).column)
+        for name in ('user', 'ingredient', 'total_amount')
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), BATCH_SIZE):
+            batch = rows[start:start + BATCH_SIZE]
+            cursor.execute(
+                f'INSERT INTO {table} ({user}, {ingredient}, {amount}) '
+                f'VALUES {", ".join(["(%s, %s, %s)"] * len(batch))} '
+                f'ON CONFLICT ({user}, {ingredient}) DO UPDATE '
+                f'SET {amount} = {table}.{amount} + EXCLUDED.{amount}',
+                [value for row in batch for value in row],
+            )
+
+
+def add_recipe(user_id, recipe_id, sign=1):
+    """Учитывает рецепт, добавленный в корзину (sign=-1 — удалённый)."""
+    add_recipes(user_id, [recipe_id], sign)
+
+
+def add_recipes(user_id, recipe_ids, sign=1):
+    """Учитывает пачку рецептов, добавленных в корзину или удалённых."""
+    if not recipe_ids:
+        return
+    apply_deltas(
+        [user_id],
+        {key: sign * value
+         for key, value in recipes_amounts(recipe_ids).items()}
+    )
+
+
+def change_recipe(recipe_id, old, new):
+    """Переносит изменение ингредиентов рецепта в списки покупок."""
+    deltas = amounts_diff(old, new)
+    if any(deltas.values()):
+        apply_deltas(
+            ShoppingCart.objects.filter(recipe_id=recipe_id)
+            .values_list('user_id', flat=True),
+            deltas
+        )
+
+
+def live_totals(user_ids=None):
+    """
+    Список покупок, посчитанный по корзинам: {(user, ingredient): sum}.
+
+    Рецепты, помеченные на удаление, уже вычтены из списков.
+    """
+    carts = (
+        {'recipe__shopping_carts__user__in': user_ids}
+        if user_ids is not None
+        else {'recipe__shopping_carts__isnull': False}
+    )
+    # Одним filter(): второй вызов добавил бы ещё одно соединение
+    # с корзинами и умножил суммы
+    rows = RecipeIngredient.objects.filter(
+        recipe__deleted_at__isnull=True, **carts
+    )
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in rows.values_list(
+            'recipe__shopping_carts__user', 'ingredient'
+        ).annotate(total=Sum('amount')).order_by().iterator()
+    }
+
+
+def stored_totals(user_ids=None):
+    """Сохранённый список покупок: {(user, ingredient): total_amount}."""
+    items = ShoppingListItem.objects.order_by()
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in items.values_list(
+            'user_id', 'ingredient_id', 'total_amount'
+        ).iterator()
+    }
+
+
+def find_drift(user_ids=None):
+    """Пользователи, у которых сохранённый список расходится с корзиной."""
+    live = live_totals(user_ids)
+    stored = stored_totals(user_ids)
+    return {
+        user_id for user_id, ingredient_id in live.keys() | stored.keys()
+        if live.get((user_id, ingredient_id))
+        != stored.get((user_id, ingredient_id))
+    }
+
+
+@transaction.atomic
+def rebuild(user_ids=None):
+    """Пересобирает списки покупок (всех или указанных пользователей)."""
+    items = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+    items.delete()
+    ShoppingListItem.objects.bulk_create(
+        (ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id,
+                          total_amount=total)
+         for (user_id, ingredient_id), total
+         in live_totals(user_ids).items()),
+        batch_size=BATCH_SIZE,
+    )
@@ -0,0 +1,112 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+
+from apps.recipes import shopping_list, timelines
+from apps.recipes.counters import COUNTERS, shift_counter
+from apps.recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from apps.recipes.versions import USER_VERSION, bump_version
+from apps.users.models import Subscribe, User
+
+# (модель, шаблон имени версии, которую сдвигает её изменение);
+# шаблон заполняется полями изменённого экземпляра
+VERSIONED = (
+    (Ingredient, 'ingredients'),
+    (Tag, 'tags'),
+    (User, 'user:{id}'),
+    (Favorite, USER_VERSION),
+    (ShoppingCart, USER_VERSION),
+    (Subscribe, USER_VERSION),
+)
+
+
+def _connect_counter(target, field, source, fk):
+    """Подключает обновление счётчика к созданию и удалению строк."""
+    attname = f'{fk}_id'
+
+    def on_save(sender, instance, created, **kwargs):
+        if created:
+            shift_counter(target, getattr(instance, attname), field, 1)
+
+    def on_delete(sender, instance, **kwargs):
+        shift_counter(target, getattr(instance, attname), field, -1)
+
+    uid = f'{source.__name__}.{field}'
+    post_save.connect(on_save, sender=source, weak=False,
+                      dispatch_uid=f'{uid}.save')
+    post_delete.connect(on_delete, sender=source, weak=False,
+                        dispatch_uid=f'{uid}.delete')
+
+
+def connect_counters():
+    """Подключает все денормализованные счётчики."""
+    for counter in COUNTERS:
+        _connect_counter(*counter)
+
+
+def _connect_version(model, name):
+    """Сдвигает версию набора данных при любом изменении модели."""
+
+    def on_change(sender, instance, **kwargs):
+        # Сдвиг после фиксации: иначе параллельный запрос успеет прочитать
+        # старые данные и запомнить их под новой меткой
+        key = name.format_map(instance.__dict__)
+        transaction.on_commit(lambda: bump_version(key))
+
+    uid = f'{model.__name__}.version.{name}'
+    post_save.connect(on_change, sender=model, weak=False,
+                      dispatch_uid=f'{uid}.save')
+    post_delete.connect(on_change, sender=model, weak=False,
+                        dispatch_uid=f'{uid}.delete')
+
+
+def connect_versions():
+    """Подключает метки версий к изменяемым моделям."""
+    for model, name in VERSIONED:
+        _connect_version(model, name)
+
+
+def _cart_saved(sender, instance, created, **kwargs):
+    if created:
+        shopping_list.add_recipe(instance.user_id, instance.recipe_id)
+
+
+def _cart_deleting(sender, instance, **kwargs):
+    # pre_delete: при каскадном удалении рецепта его ингредиенты
+    # ещё не удалены, и вычесть их из списка покупок можно
+    shopping_list.add_recipe(instance.user_id, instance.recipe_id, sign=-1)
+
+
+def connect_shopping_lists():
+    """Поддерживает ShoppingListItem при изменении корзин."""
+    post_save.connect(_cart_saved, sender=ShoppingCart,
+                      dispatch_uid='ShoppingCart.shopping_list.save')
+    pre_delete.connect(_cart_deleting, sender=ShoppingCart,
+                       dispatch_uid='ShoppingCart.shopping_list.delete')
+
+
+def _recipe_published(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(
+            lambda: timelines.fan_out(
+                instance.pk, instance.author_id, instance.pub_date
+            )
+        )
+
+
+def _subscribed(sender, instance, created, **kwargs):
+    if created:
+        timelines.backfill(instance.user_id, instance.author_id)
+
+
+def _unsubscribed(sender, instance, **kwargs):
+    timelines.trim(instance.user_id, instance.author_id)
+
+
+def connect_timelines():
+    """Поддерживает ленты подписок при публикации и подписках."""
+    post_save.connect(_recipe_published, sender=Recipe,
+                      dispatch_uid='Recipe.timeline.save')
+    post_save.connect(_subscribed, sender=Subscribe,
+                      dispatch_uid='Subscribe.timeline.save')
+    post_delete.connect(_unsubscribed, sender=Subscribe,
+                        dispatch_uid='Subscribe.timeline.delete')
@@ -0,0 +1,105 @@
+"""
+Лента подписок с разносом рецептов при публикации (fan-out on write).
+
+Новый рецепт записывается в FeedItem каждого подписчика автора
+пачками, при подписке в ленту добавляются последние рецепты автора,
+при отписке они убираются. Рецепты авторов, у которых не меньше
+FEED_CELEBRITY_SUBSCRIBERS подписчиков, не разносятся: лента читает
+их по подпискам при запросе (fan-out on read).
+
+Страница ленты читается по ключу (pub_date, id): записи FeedItem —
+по индексу (user, -pub_date, -recipe), рецепты знаменитостей —
+по индексу (author, -pub_date, -id) отдельным запросом на автора;
+результаты сливаются в Python.
+"""
+from django.db.models import Q
+
+from apps.recipes.models import FeedItem, Recipe
+from apps.users.models import Subscribe, User
+from config.constants import (
+    FEED_BACKFILL_SIZE,
+    FEED_BATCH_SIZE,
+    FEED_CELEBRITY_SUBSCRIBERS,
+)
+
+
+def is_celebrity(author_id):
+    return User.objects.filter(
+        pk=author_id, subscribers_count__gte=FEED_CELEBRITY_SUBSCRIBERS
+    ).exists()
+
+
+def _insert(rows):
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+         for user_id, recipe_id, pub_date in rows),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out(recipe_id, author_id, pub_date):
+    """Добавляет опубликованный рецепт в ленты подписчиков автора."""
+    if is_celebrity(author_id):
+        return
+    subscribers = Subscribe.objects.filter(author_id=author_id).order_by()
+    _insert(
+        (user_id, recipe_id, pub_date)
+        for user_id in subscribers.values_list('user_id', flat=True)
+        .iterator(chunk_size=FEED_BATCH_SIZE)
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние рецепты автора после подписки."""
+    if is_celebrity(author_id):
+        return
+    recipes = Recipe.objects.alive().filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('pk', 'pub_date')[:FEED_BACKFILL_SIZE]
+    _insert(
+        (user_id, recipe_id, pub_date) for recipe_id, pub_date in recipes
+    )
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты рецепты автора после отписки."""
+    FeedItem.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+
+
+def _before(position, date_field, id_field):
+    """Условие «строго после позиции» для порядка (-pub_date, -id)."""
+    if position is None:
+        return Q()
+    pub_date, recipe_id = position
+    return Q(**{f'{date_field}__lt': pub_date}) | Q(
+        **{date_field: pub_date, f'{id_field}__lt': recipe_id}
+    )
+
+
+def feed_keys(user, position=None, limit=FEED_BATCH_SIZE):
+    """
+    Ключи (pub_date, id) следующих limit рецептов ленты после
+    position, от новых к старым.
+    """
+    keys = set(
+        FeedItem.objects.filter(
+            _before(position, 'pub_date', 'recipe_id'),
+            user=user, recipe__deleted_at__isnull=True,
+        ).order_by('-pub_date', '-recipe_id')
+        .values_list('pub_date', 'recipe_id')[:limit]
+    )
+    celebrities = Subscribe.objects.filter(
+        user=user,
+        author__subscribers_count__gte=FEED_CELEBRITY_SUBSCRIBERS,
+    ).values_list('author_id', flat=True)
+    for author_id in celebrities:
+        keys.update(
+            Recipe.objects.alive().filter(
+                _before(position, 'pub_date', 'id'), author_id=author_id,
+            ).order_by('-pub_date', '-id')
+            .values_list('pub_date', 'id')[:limit]
+        )
+    return sorted(keys, reverse=True)[:limit]
@@ -0,0 +1,54 @@
+import time
+
+from apps.recipes.models import DataVersion
+
+# Версия данных пользователя: профиль, избранное, корзина, подписки
+USER_VERSION = 'user:{user_id}'
+
+
+def get_versions(*names):
+    """
+    Возвращает метки версий наборов данных (время последнего изменения).
+
+    Метки хранятся в таблице DataVersion основной базы: они общие для
+    всех контейнеров и воркеров и, в отличие от кеша, не вытесняются.
+    Все метки читаются одним запросом; недостающие создаются.
+    """
+    stamps = dict(
+        DataVersion.objects.filter(name__in=names).values_list('name', 'stamp')
+    )
+    missing = [name for name in names if name not in stamps]
+    if missing:
+        now = time.time()
+        DataVersion.objects.bulk_create(
+            [DataVersion(name=name, stamp=now) for name in missing],
+            ignore_conflicts=True,
+        )
+        stamps.update(
+            DataVersion.objects.filter(name__in=missing).values_list(
+                'name', 'stamp'
+            )
+        )
+    return [stamps[name] for name in names]
+
+
+def get_version(name):
+    """Метка версии одного набора данных."""
+    return get_versions(name)[0]
+
+
+def bump_versions(names):
+    """Сдвигает метки версий после изменения данных одним запросом."""
+    version = time.time()
+    DataVersion.objects.bulk_create(
+        [DataVersion(name=name, stamp=version) for name in set(names)],
+        update_conflicts=True,
+        unique_fields=['name'],
+        update_fields=['stamp'],
+    )
+    return version
+
+
+def bump_version(name):
+    """Сдвигает метку версии после изменения данных."""
+    return bump_versions([name])
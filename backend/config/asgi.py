@@ -1,7 +1,19 @@
+"""
+ASGI config for config project.
+
+Запуск: gunicorn -c config/gunicorn.py (см. config/gunicorn.py).
+Под ASGI читающие эндпоинты API обслуживаются асинхронно
+(settings.ASYNC_VIEWS).
+"""
+
 import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "foodgram.settings")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+os.environ.setdefault("ASYNC_VIEWS", "True")
+# Под ASGI каждый запрос выполняет синхронный код в своём потоке, и
+# постоянные соединения Django (по одному на поток) не переиспользуются
+os.environ.setdefault("CONN_MAX_AGE", "0")
 
 application = get_asgi_application()
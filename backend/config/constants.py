@@ -20,3 +20,36 @@ MAX_LENGHT_NAME_TAG = 32
 MAX_LENGHT_NAME_REC = 256
 MAX_LENGHT_MEAS_INGR = 64
 SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Совпадает с pg_trgm.word_similarity_threshold по умолчанию
+TRIGRAM_SIMILARITY_THRESHOLD = 0.6
+SEARCH_CONFIG = 'russian'
+SHOPPING_LIST_CHUNK_SIZE = 500
+MAX_BATCH_SIZE = 100
+# Варианты изображения рецепта: (ширина, высота, обрезать по размеру)
+IMAGE_VARIANTS = {
+    'card': (480, 360, True),
+    'detail': (1200, 1200, False),
+    'share': (1200, 630, True),
+}
+# Форматы вариантов: (формат Pillow, расширение, параметры сохранения)
+IMAGE_FORMATS = (
+    ('WEBP', 'webp', {'quality': 80, 'method': 6}),
+    ('JPEG', 'jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+)
+# Максимальный размер загружаемого изображения (как client_max_body_size)
+MAX_IMAGE_SIZE = 20 * 1024 * 1024
+# Лента подписок: авторы с таким числом подписчиков не разносятся по
+# лентам при публикации, их рецепты читаются напрямую
+FEED_CELEBRITY_SUBSCRIBERS = 10000
+FEED_BATCH_SIZE = 1000
+# Сколько последних рецептов автора попадает в ленту при подписке
+FEED_BACKFILL_SIZE = 100
+# Удаление пользователей и рецептов: строк зависимой таблицы за одну
+# транзакцию
+DELETION_CHUNK_SIZE = 500
+# Интервал сверки индекса автодополнения с меткой версии ингредиентов, с
+INGREDIENT_INDEX_CHECK_INTERVAL = 5
+# Запасной поиск без PostgreSQL: сколько лучших совпадений упорядочивается
+# в SQL (pk__in и CASE — три параметра на строку, старые сборки SQLite
+# принимают не больше 999)
+MAX_RANKED = 250
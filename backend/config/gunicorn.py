@@ -0,0 +1,57 @@
+"""
+Настройки gunicorn: gunicorn -c config/gunicorn.py
+
+По умолчанию приложение запускается под WSGI с воркерами gthread
+(2 × ядра + 1) и постоянными соединениями с БД. GUNICORN_ASGI=True
+запускает ASGI с воркерами uvicorn (по одному на ядро) и асинхронными
+читающими эндпоинтами. Включать его стоит только после сравнения
+с WSGI командой load_test (--output и --compare): под ASGI в
+Django 4.2 потоковые ответы (список покупок) целиком собираются
+в памяти, синхронные записи воркера выполняются по одной в общем
+потоке, а соединения с БД не переиспользуются (config/asgi.py).
+Остальные параметры переопределяются переменными окружения GUNICORN_*.
+"""
+import multiprocessing
+import os
+
+ASGI = os.getenv('GUNICORN_ASGI', 'False').lower() == 'true'
+CPU_COUNT = multiprocessing.cpu_count()
+
+if ASGI:
+    wsgi_app = 'config.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    default_workers = CPU_COUNT
+else:
+    wsgi_app = 'config.wsgi:application'
+    worker_class = 'gthread'
+    default_workers = CPU_COUNT * 2 + 1
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', worker_class)
+workers = int(os.getenv('GUNICORN_WORKERS', default_workers))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:9000')
+backlog = int(os.getenv('GUNICORN_BACKLOG', 2048))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Приложение загружается в мастере до форка: воркеры стартуют быстрее
+# и разделяют прогретые данные (см. when_ready)
+preload_app = True
+
+# Перезапуск воркеров против утечек памяти; разброс не даёт всем
+# воркерам перезапуститься одновременно
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+accesslog = os.getenv('GUNICORN_ACCESSLOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOGLEVEL', 'info')
+
+
+def when_ready(server):
+    """Прогревает приложение в мастере до того, как воркеры примут запросы."""
+    from config.warmup import warmup
+
+    server.log.info('Прогрев приложения: %s', ', '.join(warmup()))
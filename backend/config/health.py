@@ -0,0 +1,27 @@
+"""
+Проверки состояния без проверки заголовка Host.
+
+Healthcheck контейнера обращается к бэкенду по адресу localhost, а в
+ALLOWED_HOSTS боевого окружения может быть указан только домен.
+HealthCheckMiddleware стоит первой и отвечает на HEALTH_PATHS сама,
+до CommonMiddleware и SecurityMiddleware, которые вызывают
+request.get_host() и ответили бы 400 или перенаправлением на HTTPS.
+Представления проверок заголовок Host не используют.
+"""
+from django.urls import resolve
+
+HEALTH_PATHS = frozenset(('/api/health/', '/api/health/ready/'))
+
+
+class HealthCheckMiddleware:
+    """Передаёт проверки состояния прямо их представлениям."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path_info not in HEALTH_PATHS:
+            return self.get_response(request)
+        match = resolve(request.path_info)
+        response = match.func(request, *match.args, **match.kwargs)
+        return response.render()
@@ -0,0 +1,103 @@
+"""
+Чтение с реплик с гарантией read-your-writes.
+
+ReplicaRoutingMiddleware разрешает чтение с реплик только безопасным
+запросам к представлениям из REPLICA_VIEWS; реплика выбирается одна
+на весь запрос, чтобы COUNT, страница и prefetch читали данные с
+одинаковым отставанием. Клиент, выполнивший запись,
+на REPLICA_PIN_SECONDS закрепляется за основной базой: отметка хранится
+в общем кеше по хешу заголовка Authorization, поэтому действует во всех
+воркерах. Всё остальное, включая команды и фоновые задачи, работает
+с основной базой.
+"""
+import hashlib
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.urls import Resolver404, resolve
+
+from config.constants import SAFE_METHODS
+
+REPLICA_VIEWS = frozenset((
+    'apps.api.views.RecipeViewSet',
+    'apps.api.views.TagViewSet',
+    'apps.api.views.IngredientViewSet',
+    'apps.api.views.UserViewSet',
+))
+# Модели, которые всегда читаются из основной базы: токен, выданный
+# при входе, и сдвинутая метка версии могут ещё не дойти до реплики
+PRIMARY_MODELS = frozenset(('authtoken.token', 'recipes.dataversion'))
+PIN_KEY = 'foodgram:primary:{}'
+
+# Реплика, с которой читает текущий запрос; None — основная база
+replica_alias = ContextVar('replica_alias', default=None)
+
+
+def _pin_key(request):
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if not authorization:
+        return None
+    return PIN_KEY.format(
+        hashlib.sha256(authorization.encode()).hexdigest()
+    )
+
+
+def _replica_view(request):
+    try:
+        view = resolve(request.path_info).func
+    except Resolver404:
+        return False
+    view_class = getattr(view, 'cls', None)
+    return bool(view_class) and (
+        f'{view_class.__module__}.{view_class.__qualname__}' in REPLICA_VIEWS
+    )
+
+
+class ReplicaRoutingMiddleware:
+    """Решает, может ли запрос читать с реплик, и закрепляет писавших."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pin_key = _pin_key(request)
+        safe = request.method in SAFE_METHODS
+        use_replica = (
+            safe
+            and _replica_view(request)
+            and not (pin_key and cache.get(pin_key))
+        )
+        token = replica_alias.set(
+            random.choice(settings.REPLICA_DATABASES) if use_replica
+            else None
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_alias.reset(token)
+        if not safe and pin_key and response.status_code < 400:
+            cache.set(pin_key, True, settings.REPLICA_PIN_SECONDS)
+        return response
+
+
+class PrimaryReplicaRouter:
+    """Чтения разрешённых запросов — на реплику запроса, прочее — в default."""
+
+    def db_for_read(self, model, **hints):
+        alias = replica_alias.get()
+        if alias and model._meta.label_lower not in PRIMARY_MODELS:
+            return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
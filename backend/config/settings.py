@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from django.core.management.utils import get_random_secret_key
@@ -31,6 +32,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'rest_framework.authtoken',
@@ -45,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Отвечает на проверки состояния до проверки Host (config/health.py)
+    'config.health.HealthCheckMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -92,9 +96,66 @@ else:
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
             'HOST': os.getenv('DB_HOST', 'db'),
             'PORT': os.getenv('DB_PORT', 5432),
+            # Постоянные соединения с проверкой перед повторным
+            # использованием; под ASGI отключаются в config/asgi.py
+            'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
         }
     }
 
+# Реплики только для чтения (config/replicas.py). Для PostgreSQL —
+# DB_REPLICA_HOSTS: хосты через запятую (host или host:port); с
+# USE_SQLITE — SQLITE_REPLICAS: пути к файлам-копиям базы
+if os.getenv('USE_SQLITE', 'False').lower() == 'true':
+    replica_settings = [
+        {'NAME': path.strip()}
+        for path in os.getenv('SQLITE_REPLICAS', '').split(',')
+        if path.strip()
+    ]
+else:
+    replica_settings = []
+    for address in os.getenv('DB_REPLICA_HOSTS', '').split(','):
+        host, _, port = address.strip().partition(':')
+        if host:
+            replica_settings.append({
+                'HOST': host, 'PORT': port or DATABASES['default']['PORT']
+            })
+for number, replica in enumerate(replica_settings, 1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'], **replica, 'TEST': {'MIRROR': 'default'}
+    }
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+# Сколько секунд после записи чтения клиента идут в основную базу
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+if REPLICA_DATABASES:
+    DATABASE_ROUTERS = ['config.replicas.PrimaryReplicaRouter']
+    MIDDLEWARE.append('config.replicas.ReplicaRoutingMiddleware')
+
+# Учёт SQL-запросов, заголовок Server-Timing и журнал медленных
+# запросов (config/sql_timing.py)
+SQL_INSTRUMENTATION = os.getenv(
+    'SQL_INSTRUMENTATION', 'False'
+).lower() == 'true'
+SQL_SLOW_REQUEST_MS = int(os.getenv('SQL_SLOW_REQUEST_MS', 500))
+SQL_SLOW_REQUEST_QUERIES = int(os.getenv('SQL_SLOW_REQUEST_QUERIES', 30))
+# Сколько одинаковых запросов за один HTTP-запрос считается N+1
+SQL_DUPLICATE_QUERIES = int(os.getenv('SQL_DUPLICATE_QUERIES', 5))
+if SQL_INSTRUMENTATION:
+    # Первой, чтобы total включал все остальные middleware
+    MIDDLEWARE.insert(0, 'config.sql_timing.SqlTimingMiddleware')
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'foodgram_cache')
+        ),
+    }
+}
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -138,12 +199,27 @@ CSRF_COOKIE_SECURE = False
 USE_X_FORWARDED_HOST = True
 USE_X_FORWARDED_PORT = True
 
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+
+# Асинхронные реализации читающих эндпоинтов (apps/api/async_views.py);
+# config/asgi.py включает их по умолчанию
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False').lower() == 'true'
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'config.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 SWAGGER_SETTINGS = {
@@ -198,6 +274,11 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': True,
         },
+        'config.sql_timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
@@ -231,4 +312,8 @@ CORS_URLS_REGEX = r"^/api/.*$"
 FILE_NAME = "shopping_cart.txt"
 
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
+# Загружаемые файлы сразу пишутся во временный файл, не в память
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
@@ -0,0 +1,248 @@
+"""
+Учёт SQL-запросов и времени обработки запроса.
+
+SqlTimingMiddleware включается настройкой SQL_INSTRUMENTATION. Для
+каждого запроса она считает SQL-запросы и время в базе и добавляет
+заголовок Server-Timing с метриками db, serialize (serializer.data
+вместе с запросами, которые выполняются при сериализации, — там
+обычно и возникает N+1), render (отрисовка ответа рендерером) и total.
+Запросы, превысившие SQL_SLOW_REQUEST_MS или SQL_SLOW_REQUEST_QUERIES,
+пишутся в журнал с именем представления (например,
+RecipeViewSet.list) и нормализованным SQL. Одинаковые запросы,
+повторённые SQL_DUPLICATE_QUERIES раз и больше, отмечаются как
+вероятный N+1.
+
+Запросы учитываются обёрткой execute_wrapper, которая ставится на все
+соединения, в том числе открытые в потоках sync_to_async; статистика
+запроса передаётся через ContextVar и в фоновые потоки не попадает.
+Время сериализации измеряет обёртка свойства BaseSerializer.data,
+она ставится вместе с middleware. Потоковые ответы (список покупок)
+выполняют запросы уже после отправки заголовков: заголовок им не
+добавляется, а статистика учитывается до закрытия потока и пишется
+в журнал после него.
+"""
+import logging
+import re
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+# Сколько самых долгих нормализованных запросов попадает в журнал
+LOG_QUERIES_LIMIT = 10
+NORMALIZE = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+current_stats = ContextVar('sql_stats', default=None)
+
+
+def normalize(sql):
+    """SQL без литералов и параметров: одинаковый для повторов запроса."""
+    for pattern, replacement in NORMALIZE:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class RequestStats:
+    """SQL-запросы и этапы одного HTTP-запроса."""
+
+    def __init__(self):
+        self.view = None
+        self.count = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        # Глубина вложенных serializer.data: учитывается только внешний
+        self.serializing = 0
+        self.render_time = 0.0
+        self.render_started = None
+        # Нормализованный SQL: [число выполнений, суммарное время]
+        self.queries = defaultdict(lambda: [0, 0.0])
+
+    def add(self, sql, duration):
+        self.count += 1
+        self.db_time += duration
+        query = self.queries[normalize(sql)]
+        query[0] += 1
+        query[1] += duration
+
+    def rendered(self, response):
+        self.render_time = time.perf_counter() - self.render_started
+
+    def duplicates(self):
+        return sorted(
+            ((count, sql) for sql, (count, _) in self.queries.items()
+             if count >= settings.SQL_DUPLICATE_QUERIES),
+            reverse=True,
+        )
+
+    def slowest(self):
+        return sorted(
+            ((duration, count, sql)
+             for sql, (count, duration) in self.queries.items()),
+            reverse=True,
+        )[:LOG_QUERIES_LIMIT]
+
+
+def record_query(execute, sql, params, many, context):
+    """execute_wrapper: учитывает запрос в статистике текущего запроса."""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add(sql, time.perf_counter() - started)
+
+
+def install(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# Соединения, открытые после загрузки модуля, в любом потоке
+connection_created.connect(install)
+
+
+def timed_data(data):
+    """Свойство serializer.data, время которого учитывается в запросе."""
+
+    @property
+    @wraps(data.fget)
+    def wrapper(serializer):
+        stats = current_stats.get()
+        if stats is None:
+            return data.fget(serializer)
+        stats.serializing += 1
+        started = time.perf_counter()
+        try:
+            return data.fget(serializer)
+        finally:
+            stats.serializing -= 1
+            if not stats.serializing:
+                stats.serialize_time += time.perf_counter() - started
+
+    wrapper.fget.timed = True
+    return wrapper
+
+
+def install_serializer_timing():
+    if not getattr(BaseSerializer.data.fget, 'timed', False):
+        BaseSerializer.data = timed_data(BaseSerializer.data)
+
+
+def view_name(request, view_func):
+    """Имя представления для журнала: RecipeViewSet.list, health и т. п."""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return getattr(view_func, '__qualname__', repr(view_func))
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+def _ms(seconds):
+    return seconds * 1000
+
+
+def _with_stats(stats, content):
+    """Части content, каждая читается со статистикой запроса stats."""
+    iterator = iter(content)
+    while True:
+        token = current_stats.set(stats)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            current_stats.reset(token)
+        yield chunk
+
+
+class SqlTimingMiddleware:
+    """Заголовок Server-Timing и журнал медленных запросов и N+1."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_serializer_timing()
+
+    def __call__(self, request):
+        for connection in connections.all():
+            install(connection)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.stream(
+                request, stats, started, response.streaming_content
+            )
+            return response
+        total = time.perf_counter() - started
+        if not response.streaming:
+            response['Server-Timing'] = (
+                f'db;dur={_ms(stats.db_time):.1f};'
+                f'desc="SQL: {stats.count}", '
+                f'serialize;dur={_ms(stats.serialize_time):.1f}, '
+                f'render;dur={_ms(stats.render_time):.1f}, '
+                f'total;dur={_ms(total):.1f}'
+            )
+        self.log(request, stats, total)
+        return response
+
+    def stream(self, request, stats, started, content):
+        """
+        Отдаёт части потокового ответа, учитывая их запросы; статистика
+        пишется в журнал, когда поток прочитан или закрыт.
+        """
+        try:
+            for chunk in _with_stats(stats, content):
+                yield chunk
+        finally:
+            self.log(request, stats, time.perf_counter() - started)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        current_stats.get().view = view_name(request, view_func)
+
+    def process_template_response(self, request, response):
+        # Ответы DRF отрисовываются сразу после этого вызова
+        stats = current_stats.get()
+        stats.render_started = time.perf_counter()
+        response.add_post_render_callback(stats.rendered)
+        return response
+
+    def log(self, request, stats, total):
+        view = stats.view or request.path_info
+        if (_ms(total) >= settings.SQL_SLOW_REQUEST_MS
+                or stats.count >= settings.SQL_SLOW_REQUEST_QUERIES):
+            logger.warning(
+                'Медленный запрос %s %s (%s): %d SQL-запросов, БД %.1f мс, '
+                'сериализация %.1f мс, отрисовка %.1f мс, всего %.1f мс\n%s',
+                request.method, request.get_full_path(), view, stats.count,
+                _ms(stats.db_time), _ms(stats.serialize_time),
+                _ms(stats.render_time), _ms(total),
+                '\n'.join(
+                    f'  {count} × {_ms(duration):.1f} мс: {sql}'
+                    for duration, count, sql in stats.slowest()
+                ),
+            )
+        for count, sql in stats.duplicates():
+            logger.warning(
+                'Вероятный N+1 в %s: запрос выполнен %d раз: %s',
+                view, count, sql,
+            )
@@ -0,0 +1,62 @@
+"""
+Хранилище медиафайлов с именами по содержимому.
+
+Файл сохраняется как <каталог>/<2 символа хеша>/<хеш><расширение>,
+поэтому одинаковые загрузки хранятся один раз, а содержимое по
+конкретному URL никогда не меняется и может кешироваться навсегда.
+"""
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+HASH_LENGTH = 32
+HASHED_NAME = re.compile(
+    rf'(^|/)([0-9a-f]{{2}})/\2[0-9a-f]{{{HASH_LENGTH - 2}}}(\.\w+)?$'
+)
+
+
+def content_hash(content):
+    """Хеш содержимого файла; позиция чтения возвращается в начало."""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файловое хранилище, именующее файлы по хешу содержимого.
+
+    Один файл может принадлежать нескольким объектам, поэтому при
+    замене изображения старый файл не удаляется; осиротевшие файлы
+    убирает команда rehash_media --prune.
+    """
+
+    @staticmethod
+    def is_hashed(name):
+        return bool(HASHED_NAME.search(name))
+
+    def hashed_name(self, name, content):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        digest = content_hash(content)
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        saved = super().save(name, content, max_length=max_length)
+        if saved != name:
+            # Тот же файл одновременно сохранил другой процесс
+            super().delete(saved)
+        return name
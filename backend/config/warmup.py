@@ -0,0 +1,69 @@
+"""
+Прогрев процесса приложения до приёма запросов.
+
+Вызывается из gunicorn (config/gunicorn.py) в мастере после загрузки
+приложения: воркеры, созданные форком, получают готовые URLConf,
+каталоги переводов, плагины Pillow и индекс ингредиентов.
+"""
+import logging
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def _resolve_urls():
+    from django.urls import get_resolver
+
+    # Разбор URLConf импортирует все представления и сериализаторы
+    get_resolver().resolve('/api/')
+
+
+def _load_translations():
+    from django.conf import settings
+    from django.utils import translation
+
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext('Not found.')
+
+
+def _init_pillow():
+    from PIL import Image
+
+    Image.init()
+
+
+def _build_ingredient_index():
+    from apps.api.autocomplete import ingredient_index
+
+    ingredient_index.search()
+
+
+STEPS = (
+    ('urls', _resolve_urls),
+    ('translations', _load_translations),
+    ('pillow', _init_pillow),
+    ('ingredient_index', _build_ingredient_index),
+)
+
+
+def warmup():
+    """
+    Выполняет шаги прогрева и возвращает имена выполненных.
+
+    Ошибка шага не мешает запуску: он выполнится при первом запросе.
+    Соединения с БД закрываются, чтобы воркеры не унаследовали сокеты
+    мастера.
+    """
+    done = []
+    try:
+        for name, step in STEPS:
+            try:
+                step()
+            except Exception:
+                logger.exception('Прогрев %s не выполнен', name)
+            else:
+                done.append(name)
+    finally:
+        connections.close_all()
+    return done